@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Precompiled cleaners for scraped markdown (used by `FireScrape`).
+
+Every pattern is compiled once at import, and written so that the regex engine can
+skip ahead to a literal prefix where possible. The Wikipedia cleaner removes references,
+[edit] markers, <br> tags, bare URLs and ".jpg" leftovers in a single alternation
+pass instead of one `re.sub` per pattern. The old `(?:\\.jpg\\)?)?` pattern matched
+the empty string at every position; it is now `\\.jpg\\)?`, which removes the same text.
+The single pass gives the same output as the old passes except where removing one
+pattern creates or breaks a match of another (e.g. ".jpg<br>)" or "www.a.au)http://b"),
+which is unlikely in real page markdown.
+
+`python -m clear.cleaners` checks that the output is identical to the previous
+pass-per-pattern cleaners and times both on large Wikipedia/ABS-style fixtures
+(and on cached Firecrawl responses with --from-cache).
+"""
+import argparse
+import json
+import random
+import re
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List
+
+IMAGE_LINK = re.compile(r'!\[(.*?)\]\(.*?\)')
+# Markdown link, or any other bracketed text; replaced by the link text / bracket contents
+LINK_OR_BRACKET = re.compile(r'\[(.*?)\]\(.*?\)|\[(.*?)\]')
+# Same as r'^More information on.*$' with re.MULTILINE. Starting with the literal (and
+# checking for the line start behind it) lets the regex engine search for the text directly
+MORE_INFORMATION_LINE = re.compile(r'More information on(?<![^\n]More information on).*$', re.MULTILINE)
+# r'\n{3,}' and r'\n{2,}' written with a literal prefix, which is searched much faster
+BLANK_LINES = re.compile(r'\n\n\n+')
+NEWLINE_RUNS = re.compile(r'\n\n+')
+# Removal patterns of the Wikipedia cleaner, in their original order. The lookahead lists
+# the characters an alternative can start with, so other positions are skipped at once
+WIKIPEDIA_NOISE = re.compile(
+    r'(?=[!\\\[<hw.]|\s\[)'
+    r'(?:\s?\[edit\]\s?'                # [edit] with the surrounding whitespace
+    r'|!\s*<br><br>'
+    r'|\\?\[\d+\\?\]'                   # reference brackets like [1], \[2\]
+    r'|\\?\[edit(?:"\))?\\?\s*\\?\]'    # escaped [edit] markers
+    r'|<br>'
+    r'|\bhttps?://\S+\b'
+    r'|\bwww\.\S+\b'
+    r'|\.jpg\)?)'
+)
+
+
+def simple_clean(content: str) -> str:
+    content = IMAGE_LINK.sub(r'\1', content)
+    content = MORE_INFORMATION_LINE.sub('', content)
+    return BLANK_LINES.sub('\n', content)
+
+
+def clean_general(content: str) -> str:
+    content = IMAGE_LINK.sub(r'\1', content)
+    return BLANK_LINES.sub('\n', content).strip()
+
+
+def clean_wikipedia(content: str) -> str:
+    content = IMAGE_LINK.sub(r'\1', content)
+    content = LINK_OR_BRACKET.sub(r'\1\2', content)
+    content = WIKIPEDIA_NOISE.sub('', content)
+    content = NEWLINE_RUNS.sub('\n', content)
+
+    if "the free encyclopedia" in content:
+        content = content.split('the free encyclopedia', 1)[1].strip()
+    if 'References\n' in content:
+        content = content.split('References\n', 1)[0].strip()
+    return content.strip()
+
+
+CLEANERS = {"simple": simple_clean, "general": clean_general, "wiki": clean_wikipedia}
+
+
+# -------------------------------------------------------
+# Benchmark against the previous pass-per-pattern cleaners
+# -------------------------------------------------------
+def _reference_simple_clean(content: str) -> str:
+    content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
+    content = re.sub(r'^More information on.*$', '', content, flags=re.MULTILINE)
+    content = re.sub(r'\n{3,}', '\n', content)
+    return content
+
+
+def _reference_clean_general(content: str) -> str:
+    content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
+    content = re.sub(r'\n{3,}', '\n', content)
+    return content.strip()
+
+
+def _reference_clean_wikipedia(content: str) -> str:
+    content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
+    content = re.sub(r'\[(.*?)\]\(.*?\)|\[(.*?)\]', lambda m: (m.group(1) or m.group(2)), content)
+    removal_patterns = [
+        r'\[\d+\]',
+        r'\s?\[edit\]\s?',
+        r'!\s*<br><br>',
+        r'\\?\[\d+\\?\]',
+        r'\\?\[edit(?:\"\))?\\?\s*\\?\]',
+        r'<br>',
+        r'\bhttps?://\S+\b',
+        r'\bwww\.\S+\b',
+        r'(?:\.jpg\)?)?'
+    ]
+    for pattern in removal_patterns:
+        content = re.sub(pattern, '', content)
+    content = re.sub(r'\n{2,}', '\n', content)
+    if "the free encyclopedia" in content:
+        content = content.split('the free encyclopedia', 1)[1].strip()
+    if 'References\n' in content:
+        content, references = map(str.strip, content.split('References\n', 1))
+    return content.strip()
+
+
+REFERENCE_CLEANERS = {
+    "simple": _reference_simple_clean,
+    "general": _reference_clean_general,
+    "wiki": _reference_clean_wikipedia,
+}
+
+_WORDS = ("council", "shire", "river", "population", "climate", "water", "drought", "heritage", "railway",
+          "district", "community", "rainfall", "agriculture", "coastal", "bushfire", "settlement", "census")
+
+
+def _sentence(rng: random.Random, i: int) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 20))]
+    if rng.random() < 0.5:
+        words.insert(rng.randrange(len(words)), f"[{rng.choice(_WORDS)}](https://en.wikipedia.org/wiki/Page_{i})")
+    if rng.random() < 0.4:
+        words[-1] += f"[\\[{rng.randint(1, 200)}\\]](https://en.wikipedia.org/wiki/Town#cite_note-{i})"
+    if rng.random() < 0.1:
+        words.append(f"www.council{i}.nsw.gov.au")
+    if rng.random() < 0.1:
+        words.append(f"<br>https://example.org/report_{i}.pdf")
+    return " ".join(words).capitalize() + "."
+
+
+def wikipedia_fixture(size: int = 300_000, seed: int = 0) -> str:
+    """Firecrawl-style markdown of a long Wikipedia article."""
+    rng = random.Random(seed)
+    parts = ["From Wikipedia, the free encyclopedia\n\n"]
+    i = 0
+    while sum(map(len, parts)) < size:
+        i += 1
+        parts.append(f"## Section {i}\\[[edit](https://en.wikipedia.org/w/index.php?action=edit&section={i})\\]\n\n")
+        if i % 3 == 0:
+            parts.append(f"[![Photo {i}](https://upload.wikimedia.org/thumb/Photo_{i}.jpg)](https://en.wikipedia.org/wiki/File:Photo_{i}.jpg)\n\n")
+        parts.append(" ".join(_sentence(rng, i) for _ in range(rng.randint(3, 8))) + "\n\n\n")
+    parts.append("References\n\n")
+    parts.extend(f"{n}. [^](#cite_ref-{n}) \"Census\". https://www.abs.gov.au/{n}\n" for n in range(1, 150))
+    return "".join(parts)
+
+
+def census_fixture(size: int = 300_000, seed: int = 1) -> str:
+    """Firecrawl-style markdown of an ABS census QuickStats page (mostly tables)."""
+    rng = random.Random(seed)
+    parts = ["![ABS logo](https://www.abs.gov.au/logo.png)\n\n# 2021 Census All persons QuickStats\n\n"]
+    i = 0
+    while sum(map(len, parts)) < size:
+        i += 1
+        parts.append(f"## {rng.choice(_WORDS).title()} {i}\n\n\n\n| Characteristic | Count | % |\n| --- | --- | --- |\n")
+        parts.extend(
+            f"| {rng.choice(_WORDS)} {row} | {rng.randint(10, 90000):,} | {rng.uniform(0, 100):.1f} |\n"
+            for row in range(rng.randint(5, 25))
+        )
+        parts.append(f"\nMore information on {rng.choice(_WORDS)}\n\n\n![Chart {i}](https://www.abs.gov.au/chart_{i}.svg)\n\n")
+    return "".join(parts)
+
+
+def cached_fixtures(path: str = None) -> Dict[str, str]:
+    """Raw Firecrawl scrapes stored in the response cache, keyed on their URL."""
+    from clear.http_cache import HTTP_CACHE_PATH
+
+    with closing(sqlite3.connect(path or HTTP_CACHE_PATH)) as conn:
+        rows = conn.execute("SELECT request, value FROM responses WHERE source = 'firecrawl'").fetchall()
+    fixtures = {}
+    for request_text, value_text in rows:
+        value = json.loads(value_text)
+        if isinstance(value, str) and value:
+            fixtures[json.loads(request_text)["url"]] = value
+    return fixtures
+
+
+def _best_of(func, content: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(fixtures: Dict[str, str], repeat: int = 5) -> List[Dict]:
+    """
+    Run every cleaner on every fixture, check the output matches the reference
+    cleaner, and report the best-of-`repeat` time of each.
+    """
+    results = []
+    for name, content in fixtures.items():
+        for kind, cleaner in CLEANERS.items():
+            reference = REFERENCE_CLEANERS[kind]
+            reference_seconds = _best_of(reference, content, repeat)
+            seconds = _best_of(cleaner, content, repeat)
+            results.append({
+                "fixture": name,
+                "cleaner": kind,
+                "kb": round(len(content) / 1024, 1),
+                "parity": cleaner(content) == reference(content),
+                "reference_ms": round(reference_seconds * 1000, 2),
+                "compiled_ms": round(seconds * 1000, 2),
+                "speedup": round(reference_seconds / seconds, 2),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the compiled cleaners against the previous ones and time both.")
+    parser.add_argument("--size", type=int, default=300_000, help="Size of each synthetic fixture in characters.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--from-cache", action="store_true", help="Also use the Firecrawl responses in the response cache.")
+    args = parser.parse_args()
+
+    fixtures = {"wikipedia": wikipedia_fixture(args.size), "census": census_fixture(args.size)}
+    if args.from_cache:
+        fixtures.update(cached_fixtures())
+
+    results = benchmark(fixtures, repeat=args.repeat)
+    for row in results:
+        print(row)
+    mismatches = [row for row in results if not row["parity"]]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} cleaner outputs differ from the reference")
+    print("All outputs match the reference cleaners.")
+
+
+if __name__ == "__main__":
+    main()
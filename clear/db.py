@@ -1,30 +1,411 @@
-import pandas as pd
+import hashlib
+import math
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
 from rapidfuzz import fuzz, process
+from operator import itemgetter
 from typing import Dict, Optional, Tuple, List
 
-# 读取 Excel 文件，并转换为列表形式的数据
-suburbs_df = pd.read_excel("./data/db/db_suburbs.xlsx")
-lga_df = pd.read_excel("./data/db/db_lga.xlsx")
-policies_df = pd.read_excel("./data/db/db_policies.xlsx")
-
-suburbs_data = suburbs_df.to_dict(orient="records")
-lga_data = lga_df.to_dict(orient="records")
-policies_data = policies_df.to_dict(orient="records")
-
-
-class PolicyMatcher:
-    def __init__(self, similarity_threshold=80):
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = os.path.join(ROOT_DIR, "data", "db")
+CACHE_DIR = os.path.join(DB_DIR, ".cache")
+CACHE_VERSION = 1
+
+# 参考数据表名 -> 文件名（不含扩展名）
+TABLES = {
+    "suburbs": "db_suburbs",
+    "lga": "db_lga",
+    "policies": "db_policies",
+}
+
+# PolicyMatcher 精确查询使用的复合索引（字段按字母序排列）
+SUBURB_INDEX_KEYS = [
+    ("suburb",),
+    ("state", "suburb"),
+    ("lga", "suburb"),
+    ("lga", "state", "suburb"),
+    ("lga",),
+]
+LGA_INDEX_KEYS = [("lga",), ("lga", "state")]
+POLICY_INDEX_KEYS = [("lga",)]
+# suburb 模糊匹配的候选分区，按优先级排列
+SUBURB_PARTITION_KEYS = [("lga", "state"), ("lga",), ("state",)]
+# 候选数不少于该值时才做长度/字符计数预筛选，小分区直接交给 rapidfuzz
+PREFILTER_MIN_CANDIDATES = 256
+# search_many 中每次 cdist 打分的查询行数，限制分数矩阵的内存占用
+FUZZY_BATCH_SIZE = 256
+
+_tables: Dict[str, List[Dict]] = {}
+_tables_lock = threading.Lock()
+
+# 进程内共享的 PolicyMatcher，见 get_policy_matcher
+_matcher: Optional["PolicyMatcher"] = None
+_matcher_version: Optional[Tuple] = None
+_matcher_lock = threading.Lock()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_path(name: str) -> str:
+    """返回数据表的源文件路径：优先 xlsx，缺失时回退到 csv"""
+    base = os.path.join(DB_DIR, TABLES[name])
+    for ext in (".xlsx", ".csv"):
+        if os.path.exists(base + ext):
+            return base + ext
+    raise FileNotFoundError(f"No source file found for table '{name}' in {DB_DIR}")
+
+
+def _read_source(path: str) -> List[Dict]:
+    import pandas as pd
+
+    if path.endswith(".xlsx"):
+        try:
+            df = pd.read_excel(path)
+        except ImportError:
+            # 未安装 openpyxl 时使用同名 csv
+            df = pd.read_csv(path[: -len(".xlsx")] + ".csv")
+    else:
+        df = pd.read_csv(path)
+    return df.to_dict(orient="records")
+
+
+def _read_snapshot(cache_path: str) -> Optional[Dict]:
+    try:
+        with open(cache_path, "rb") as file:
+            snapshot = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != CACHE_VERSION:
+        return None
+    return snapshot
+
+
+def _write_snapshot(cache_path: str, snapshot: Dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write reference data cache {cache_path}: {e}")
+
+
+def _load_table_from_disk(name: str) -> List[Dict]:
+    """
+    读取一张参考数据表。
+
+    优先使用 CACHE_DIR 中的 pickle 快照；快照以源文件的 mtime/size 和 sha256 为键，
+    源文件 (xlsx) 变化时自动重建。
+    """
+    source = _source_path(name)
+    stat = os.stat(source)
+    cache_path = os.path.join(CACHE_DIR, f"{TABLES[name]}.pkl")
+
+    snapshot = _read_snapshot(cache_path)
+    if snapshot and snapshot["source"] == os.path.basename(source):
+        if (snapshot["mtime_ns"], snapshot["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return snapshot["records"]
+        # mtime 变化但内容未变（例如 git checkout），只刷新快照元数据
+        sha256 = _file_sha256(source)
+        if snapshot["sha256"] == sha256:
+            snapshot.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_snapshot(cache_path, snapshot)
+            return snapshot["records"]
+    else:
+        sha256 = _file_sha256(source)
+
+    records = _read_source(source)
+    _write_snapshot(
+        cache_path,
+        {
+            "version": CACHE_VERSION,
+            "source": os.path.basename(source),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "records": records,
+        },
+    )
+    return records
+
+
+def load_table(name: str) -> List[Dict]:
+    """按需加载参考数据表（首次使用时读取，之后在进程内复用）"""
+    records = _tables.get(name)
+    if records is None:
+        with _tables_lock:
+            records = _tables.get(name)
+            if records is None:
+                records = _tables[name] = _load_table_from_disk(name)
+    return records
+
+
+def clear_table_cache():
+    """清空进程内缓存的数据表，下次访问时重新检查源文件"""
+    with _tables_lock:
+        _tables.clear()
+
+
+def _length_key(name: str) -> Tuple[int, str]:
+    return len(name), name
+
+
+def _length_window(length: int, score_cutoff: float) -> Tuple[int, float]:
+    """
+    fuzz.ratio 的上界为 200 * min(a, b) / (a + b)，据此返回可能达到 score_cutoff 的候选长度范围
+    """
+    if score_cutoff <= 0:
+        return 0, math.inf
+    low = math.ceil(score_cutoff * length / (200 - score_cutoff) - 1e-9)
+    high = math.floor(length * (200 - score_cutoff) / score_cutoff + 1e-9)
+    return low, high
+
+
+def _copy_result(result: Dict) -> Dict:
+    """
+    复制 search 的结果：结果中的记录都是只含标量的字典，逐层浅复制即可，比 deepcopy 快得多
+    """
+    copied = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            value = dict(value)
+        elif isinstance(value, list):
+            value = [dict(item) if isinstance(item, dict) else item for item in value]
+        copied[key] = value
+    return copied
+
+
+def __getattr__(name: str):
+    # 兼容旧的模块级变量 suburbs_data / lga_data / policies_data
+    if name.endswith("_data") and name[: -len("_data")] in TABLES:
+        return load_table(name[: -len("_data")])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _ReferenceData:
+    """
+    PolicyMatcher 使用的一份参考数据快照及其派生结构（名称列表、索引、候选分区）。
+
+    快照创建后不再替换其中的字段，reload 时整体换成新的快照，
+    因此同一次调用内读取到的各结构总是一致的。
+    """
+
+    def __init__(self, suburbs_data: List[Dict], lga_data: List[Dict], policies_data: List[Dict]):
         self.suburbs_data = suburbs_data
         self.lga_data = lga_data
         self.policies_data = policies_data
-        self.similarity_threshold = similarity_threshold
-        
-        self._cache_reference_data()
 
-    def _cache_reference_data(self):
         self.lga_names = list({item["lga"] for item in self.lga_data})
-        self.suburb_list = list({item["suburb"] for item in self.suburbs_data})
+        # 按 (长度, 名称) 排序，使模糊匹配可以按长度窗口截取候选
+        self.suburb_list = sorted({item["suburb"] for item in self.suburbs_data}, key=_length_key)
         self.state_list = list({item["state"] for item in self.suburbs_data})
+        self.suburb_set = set(self.suburb_list)
+        self.lga_set = set(self.lga_names)
+
+        # 索引在第一次按对应字段组合查询时建立，见 lookup
+        self.suburb_index: Dict[Tuple[str, ...], Dict] = {}
+        self.lga_index: Dict[Tuple[str, ...], Dict] = {}
+        self.policy_index: Dict[Tuple[str, ...], Dict] = {}
+        self.suburb_partitions = self._build_partitions(self.suburbs_data)
+        # 各候选列表的字符计数矩阵在第一次使用时建立，见 _char_count_filter
+        self.suburb_char_counts: Dict[Optional[Tuple], Tuple] = {}
+
+    @staticmethod
+    def _build_partitions(records: List[Dict]) -> Dict[Tuple[str, ...], Dict]:
+        """一次遍历建立 suburb 模糊匹配的候选分区，分区内名称按 (长度, 名称) 排序"""
+        partitions: Dict[Tuple[str, ...], Dict] = {keys: {} for keys in SUBURB_PARTITION_KEYS}
+        by_lga_state = partitions[("lga", "state")]
+        by_lga = partitions[("lga",)]
+        by_state = partitions[("state",)]
+        # 先整体排序一次，分区内按插入顺序去重即可保持 (长度, 名称) 顺序
+        for suburb, state, lga in sorted(map(itemgetter("suburb", "state", "lga"), records), key=itemgetter(0)):
+            by_lga_state.setdefault((lga, state), {})[suburb] = None
+            by_lga.setdefault((lga,), {})[suburb] = None
+            by_state.setdefault((state,), {})[suburb] = None
+        for partition in partitions.values():
+            for value, names in partition.items():
+                partition[value] = sorted(names, key=len)
+        return partitions
+
+    @staticmethod
+    def _build_index(records: List[Dict], keys: Tuple[str, ...]) -> Dict[Tuple, List[Dict]]:
+        """为一组字段建立 值元组 -> 记录列表 的哈希索引，列表保持原始顺序"""
+        index: Dict[Tuple, List[Dict]] = {}
+        getter = itemgetter(*keys)
+        if len(keys) == 1:
+            for item in records:
+                index.setdefault((getter(item),), []).append(item)
+        else:
+            for item in records:
+                index.setdefault(getter(item), []).append(item)
+        return index
+
+    def lookup(
+        self, records: List[Dict], indexes: Dict, key_sets: List[Tuple[str, ...]], query: Dict
+    ) -> List[Dict]:
+        keys = tuple(sorted(query))
+        index = indexes.get(keys)
+        if index is None:
+            if keys not in key_sets:
+                # 没有对应索引的字段组合退回线性扫描
+                return [item for item in records if all(item.get(key) == value for key, value in query.items())]
+            index = indexes[keys] = self._build_index(records, keys)
+        return index.get(tuple(query[key] for key in keys), [])
+
+    def suburb_partition(self, query_state: Optional[str], query_lga: Optional[str]) -> Optional[Tuple]:
+        """选择 suburb 模糊匹配的候选分区：(lga, state) > lga > state，均不可用时返回 None"""
+        query = {"lga": query_lga, "state": query_state}
+        for keys in SUBURB_PARTITION_KEYS:
+            if all(query[key] for key in keys):
+                value = tuple(query[key] for key in keys)
+                if value in self.suburb_partitions[keys]:
+                    return keys, value
+        return None
+
+    def suburb_candidates(self, query: Optional[str], partition: Optional[Tuple], score_cutoff: float) -> List[str]:
+        if partition:
+            keys, value = partition
+            names = self.suburb_partitions[keys][value]
+        else:
+            names = self.suburb_list
+        if not query or len(names) < PREFILTER_MIN_CANDIDATES:
+            return names
+        # 先按长度窗口截取，再按共有字符数的上界过滤，两步都不会丢掉达到 score_cutoff 的候选
+        return self._char_count_filter(query, names, partition, score_cutoff)
+
+    def _char_count_filter(
+        self, query: str, names: List[str], partition: Optional[Tuple], score_cutoff: float
+    ) -> List[str]:
+        """
+        fuzz.ratio = 200 * LCS / (a + b)，而 LCS 不超过两个字符串共有的字符数（按多重集计），
+        因此共有字符数给出的上界低于 score_cutoff 的候选可以直接丢弃。names 须按长度升序排列。
+        """
+        import numpy as np
+
+        char_counts = self.suburb_char_counts.get(partition)
+        if char_counts is None:
+            char_counts = self.suburb_char_counts[partition] = self._build_char_counts(names)
+        char_rows, counts, lengths = char_counts
+
+        low, high = _length_window(len(query), score_cutoff)
+        start = int(np.searchsorted(lengths, low, side="left"))
+        stop = int(np.searchsorted(lengths, high, side="right"))
+
+        shared = np.zeros(stop - start, dtype=np.int32)
+        for char, count in Counter(query).items():
+            row = char_rows.get(char)
+            if row is not None:
+                shared += np.minimum(counts[row, start:stop], count)
+        bound = 200 * shared / (len(query) + lengths[start:stop])
+        keep = np.flatnonzero(bound >= score_cutoff - 1e-9) + start
+        return [names[index] for index in keep]
+
+    @staticmethod
+    def _build_char_counts(names: List[str]) -> Tuple[Dict[str, int], "np.ndarray", "np.ndarray"]:
+        """返回 (字符 -> 行号, 字符 x 名称 的计数矩阵, 名称长度数组)"""
+        import numpy as np
+
+        char_rows: Dict[str, int] = {}
+        rows, columns = [], []
+        for column, name in enumerate(names):
+            for char in name:
+                rows.append(char_rows.setdefault(char, len(char_rows)))
+                columns.append(column)
+        counts = np.zeros((len(char_rows), len(names)), dtype=np.uint8)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1)
+        return char_rows, counts, np.array([len(name) for name in names], dtype=np.int32)
+
+
+class PolicyMatcher:
+    def __init__(self, similarity_threshold=80, cache_size=1024):
+        self.similarity_threshold = similarity_threshold
+        # search 结果的 LRU 缓存，cache_size=0 时关闭
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_counters = {"hits": 0, "misses": 0, "evictions": 0, "miss_seconds": 0.0}
+        # 每次 reload 加一；开始于旧数据的查询结果不会写入缓存
+        self._generation = 0
+
+        self._data = self._load_reference_data()
+
+    @staticmethod
+    def _load_reference_data() -> _ReferenceData:
+        return _ReferenceData(load_table("suburbs"), load_table("lga"), load_table("policies"))
+
+    # 兼容原有的参考数据属性，均来自当前快照
+    suburbs_data = property(lambda self: self._data.suburbs_data)
+    lga_data = property(lambda self: self._data.lga_data)
+    policies_data = property(lambda self: self._data.policies_data)
+    lga_names = property(lambda self: self._data.lga_names)
+    suburb_list = property(lambda self: self._data.suburb_list)
+    state_list = property(lambda self: self._data.state_list)
+
+    def reload(self):
+        """
+        重新检查源文件并加载参考数据，同时清空 search 结果缓存。
+
+        新快照在旁边构建完成后一次性替换，正在进行的查询继续使用旧快照。
+        """
+        clear_table_cache()
+        data = self._load_reference_data()
+        with self._cache_lock:
+            self._data = data
+            self._generation += 1
+            self._result_cache.clear()
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._result_cache.clear()
+
+    def cache_stats(self) -> Dict:
+        """返回 search 结果缓存的命中统计，用于调整 cache_size"""
+        with self._cache_lock:
+            counters = dict(self._cache_counters)
+            size = len(self._result_cache)
+        lookups = counters["hits"] + counters["misses"]
+        miss_seconds = counters.pop("miss_seconds")
+        counters.update(
+            size=size,
+            maxsize=self.cache_size,
+            hit_rate=counters["hits"] / lookups if lookups else 0.0,
+            mean_miss_latency_ms=1000 * miss_seconds / counters["misses"] if counters["misses"] else 0.0,
+        )
+        return counters
+
+    def _cache_get(self, key: Tuple) -> Optional[Dict]:
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            result = self._result_cache.get(key)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(key)
+            self._cache_counters["hits"] += 1
+        return _copy_result(result)
+
+    def _cache_put(self, key: Tuple, result: Dict, elapsed: float, generation: int):
+        with self._cache_lock:
+            self._cache_counters["misses"] += 1
+            self._cache_counters["miss_seconds"] += elapsed
+            if not self.cache_size or generation != self._generation:
+                return
+            # 缓存中保存独立副本，调用方修改返回值不会影响缓存或参考数据
+            self._result_cache[key] = _copy_result(result)
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+                self._cache_counters["evictions"] += 1
 
     def _log(self, message: str, log_info: List[str]):
         """将日志信息追加到 log_info 列表中"""
@@ -32,39 +413,55 @@ class PolicyMatcher:
 
     # 以下方法用于在本地列表中查询数据，模拟 MongoDB 的 find_one/find 行为
     def _find_suburb_one(self, query: Dict) -> Optional[Dict]:
-        for item in self.suburbs_data:
-            if all(item.get(key) == value for key, value in query.items()):
-                return item
-        return None
+        data = self._data
+        matches = data.lookup(data.suburbs_data, data.suburb_index, SUBURB_INDEX_KEYS, query)
+        return matches[0] if matches else None
 
     def _find_lga_one(self, query: Dict) -> Optional[Dict]:
-        for item in self.lga_data:
-            if all(item.get(key) == value for key, value in query.items()):
-                return item
-        return None
+        data = self._data
+        matches = data.lookup(data.lga_data, data.lga_index, LGA_INDEX_KEYS, query)
+        return matches[0] if matches else None
 
     def _find_suburbs_many(self, query: Dict) -> List[Dict]:
-        return [item for item in self.suburbs_data if all(item.get(key) == value for key, value in query.items())]
+        data = self._data
+        return list(data.lookup(data.suburbs_data, data.suburb_index, SUBURB_INDEX_KEYS, query))
 
     def _find_policies_many(self, query: Dict) -> List[Dict]:
-        return [item for item in self.policies_data if all(item.get(key) == value for key, value in query.items())]
+        data = self._data
+        return list(data.lookup(data.policies_data, data.policy_index, POLICY_INDEX_KEYS, query))
 
     def find_similar(
-        self, query: str, choices: List[str], threshold: int = 80, log_info: List[str] = None
+        self,
+        query: str,
+        choices: List[str],
+        threshold: int = 80,
+        log_info: List[str] = None,
+        best_match: Optional[Tuple] = None,
+        score_cutoff: Optional[float] = None,
     ) -> Optional[Tuple[str, int]]:
+        """
+        best_match 为预先计算的 (match, similarity)，提供时跳过 process.extract；空元组表示没有达到
+        score_cutoff 的候选。score_cutoff 会传给 rapidfuzz 以便提前跳过不可能的候选。
+        """
         if not query or not choices:
             self._log(f"find_similar: Skipping as query='{query}' or choices are empty", log_info)
             return None
 
-        matches = process.extract(query, choices, scorer=fuzz.ratio, limit=1)
+        if best_match is not None:
+            matches = [best_match] if best_match else []
+        else:
+            matches = process.extract(query, choices, scorer=fuzz.ratio, limit=1, score_cutoff=score_cutoff)
+        if not matches and score_cutoff is not None:
+            self._log(f"find_similar: No match above {score_cutoff}% for query '{query}'", log_info)
         if matches:
             best_match = matches[0]
             if isinstance(best_match, tuple) and len(best_match) >= 2:
                 match, similarity = best_match[:2]
                 
                 # 检查名称是否同时存在于 suburb 和 LGA 列表中
-                is_suburb = match in self.suburb_list
-                is_lga = match in self.lga_names
+                data = self._data
+                is_suburb = match in data.suburb_set
+                is_lga = match in data.lga_set
                 
                 if is_suburb and is_lga:
                     suburb_info = self._find_suburb_one({"suburb": match})
@@ -101,12 +498,176 @@ class PolicyMatcher:
         query_suburb: Optional[str] = None,
         query_state: Optional[str] = None,
         query_lga: Optional[str] = None,
+    ) -> Dict:
+        key = self._normalise_key(query_suburb, query_state, query_lga)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        generation = self._generation
+        start = time.perf_counter()
+        result = self._search(*key, {})
+        self._cache_put(key, result, time.perf_counter() - start, generation)
+        return _copy_result(result)
+
+    def search_many(self, locations: List[Optional[Dict]]) -> List[Dict]:
+        """
+        批量解析位置，返回与输入顺序一致、结构与 search 相同的结果列表。
+
+        相同的输入只解析一次；所有需要模糊匹配的 suburb/LGA 名称先用
+        process.cdist 一次性打分，再逐条执行与 search 相同的匹配流程。
+        """
+        keys = [self._location_key(location) for location in locations]
+        resolved = {}
+        for key in dict.fromkeys(keys):
+            cached = self._cache_get(key)
+            if cached is not None:
+                resolved[key] = cached
+
+        missing = [key for key in dict.fromkeys(keys) if key not in resolved]
+        generation = self._generation
+        start = time.perf_counter()
+        fuzzy_matches = self._batch_fuzzy_matches(missing)
+        batch_seconds = time.perf_counter() - start
+        for key in missing:
+            start = time.perf_counter()
+            resolved[key] = self._search(*key, fuzzy_matches)
+            # 批量打分的耗时平摊到每个未命中的位置
+            elapsed = time.perf_counter() - start + batch_seconds / len(missing)
+            self._cache_put(key, resolved[key], elapsed, generation)
+
+        # 每个位置返回独立副本，避免调用方修改时互相影响
+        return [_copy_result(resolved[key]) for key in keys]
+
+    @staticmethod
+    def _normalise_key(
+        query_suburb: Optional[str], query_state: Optional[str], query_lga: Optional[str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """归一化查询，作为 search 缓存的键"""
+        return (
+            (query_suburb.strip().title() or None) if query_suburb else None,
+            (query_state.strip().upper() or None) if query_state else None,
+            (query_lga.strip().title() or None) if query_lga else None,
+        )
+
+    @classmethod
+    def _location_key(cls, location: Optional[Dict]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        location = location or {}
+        return cls._normalise_key(
+            location.get("query_suburb"), location.get("query_state"), location.get("query_lga")
+        )
+
+    def _batch_fuzzy_matches(self, keys: List[Tuple]) -> Dict[Tuple[str, str], Tuple[str, float]]:
+        """为一批位置预先计算模糊匹配的最佳候选，键为 (kind, 归一化名称)"""
+        data = self._data
+        suburbs: Dict[Optional[Tuple], set] = {}
+        lgas = set()
+        for query_suburb, query_state, query_lga in keys:
+            query_lga = query_lga.strip().title() if query_lga else None
+            if query_lga:
+                lgas.add(query_lga)
+                if not query_suburb or not query_state:
+                    continue
+            if query_suburb:
+                query_suburb = query_suburb.strip().title()
+                query_state = query_state.strip().upper() if query_state else None
+                if self._exact_match(query_suburb, query_state, query_lga, []):
+                    continue
+                partition = data.suburb_partition(query_state, query_lga)
+                suburbs.setdefault(partition, set()).add(query_suburb)
+
+        fuzzy_matches = {}
+        for partition, names in suburbs.items():
+            choices = data.suburb_candidates(None, partition, self.similarity_threshold)
+            # 已存在的名称与自身完全匹配，无需打分
+            known = data.suburb_set if partition is None else set(choices)
+            fuzzy_matches.update((("suburb", name, partition), (name, 100.0)) for name in names if name in known)
+            names = {name for name in names if name not in known}
+            for name, best in self._best_matches(sorted(names), choices, self.similarity_threshold).items():
+                fuzzy_matches[("suburb", name, partition)] = best
+
+        fuzzy_matches.update((("lga", name), (name, 100.0)) for name in lgas if name in data.lga_set)
+        unknown_lgas = sorted(name for name in lgas if name not in data.lga_set)
+        for name, best in self._best_matches(unknown_lgas, data.lga_names).items():
+            fuzzy_matches[("lga", name)] = best
+        return fuzzy_matches
+
+    @staticmethod
+    def _best_matches(
+        queries: List[str], choices: List[str], score_cutoff: Optional[float] = None
+    ) -> Dict[str, Tuple]:
+        """用 cdist 为每个查询取最佳候选；低于 score_cutoff 时记为空元组"""
+        if not queries or not choices:
+            return {}
+        import numpy as np
+
+        best_matches = {}
+        for start in range(0, len(queries), FUZZY_BATCH_SIZE):
+            chunk = queries[start : start + FUZZY_BATCH_SIZE]
+            scores = process.cdist(
+                chunk, choices, scorer=fuzz.ratio, dtype=np.float64, workers=-1, score_cutoff=score_cutoff
+            )
+            for query, row, index in zip(chunk, scores, scores.argmax(axis=1)):
+                score = float(row[index])
+                if score_cutoff is not None and score < score_cutoff:
+                    best_matches[query] = ()
+                else:
+                    best_matches[query] = (choices[index], score)
+        return best_matches
+
+    def find_similar_suburb(
+        self,
+        query: Optional[str],
+        query_state: Optional[str] = None,
+        query_lga: Optional[str] = None,
+        log_info: List[str] = None,
+        fuzzy_matches: Optional[Dict] = None,
+    ) -> Optional[Tuple[str, int]]:
+        """
+        模糊匹配 suburb。提供 state/LGA 时只在对应分区内匹配；否则先按长度和共有字符数预筛选候选。
+        """
+        data = self._data
+        partition = data.suburb_partition(query_state, query_lga)
+        if partition:
+            keys, value = partition
+            self._log(f"find_similar_suburb: Restricting candidates to {dict(zip(keys, value))}", log_info)
+        best_match = (fuzzy_matches or {}).get(("suburb", query, partition))
+        candidates = data.suburb_list
+        if best_match is None and query:
+            filtered = data.suburb_candidates(query, partition, self.similarity_threshold)
+            if filtered:
+                candidates = filtered
+            else:
+                # 预筛选后没有候选，等同于没有达到阈值的匹配
+                best_match = ()
+        return self.find_similar(
+            query,
+            candidates,
+            self.similarity_threshold,
+            log_info,
+            best_match=best_match,
+            score_cutoff=self.similarity_threshold,
+        )
+
+    def _find_similar_lga(
+        self, query: Optional[str], log_info: List[str], fuzzy_matches: Dict
+    ) -> Optional[Tuple[str, int]]:
+        return self.find_similar(
+            query, self.lga_names, self.similarity_threshold, log_info, best_match=fuzzy_matches.get(("lga", query))
+        )
+
+    def _search(
+        self,
+        query_suburb: Optional[str],
+        query_state: Optional[str],
+        query_lga: Optional[str],
+        fuzzy_matches: Dict,
     ) -> Dict:
         log_info: List[str] = []
 
         # 如果仅提供 LGA，则走 LGA 搜索逻辑
         if query_lga and (not query_suburb or not query_state):
-            return self._search_by_lga(query_lga, log_info, query_state)
+            return self._search_by_lga(query_lga, log_info, query_state, fuzzy_matches)
 
         # 归一化输入
         query_suburb = query_suburb.strip().title() if query_suburb else None
@@ -124,7 +685,7 @@ class PolicyMatcher:
             return self._build_response(exact_match, "Exact match", log_info)
 
         # 2. 模糊匹配 suburb，再精确匹配 state/LGA
-        fuzzy_suburb = self.find_similar(query_suburb, self.suburb_list, self.similarity_threshold, log_info)
+        fuzzy_suburb = self.find_similar_suburb(query_suburb, query_state, query_lga, log_info, fuzzy_matches)
         if fuzzy_suburb:
             self._log(f"search: Fuzzy suburb match found: {fuzzy_suburb[0]}", log_info)
             match = self._exact_match(fuzzy_suburb[0], query_state, query_lga, log_info)
@@ -133,7 +694,7 @@ class PolicyMatcher:
 
         # 3. 精确 suburb，模糊匹配 LGA
         fuzzy_lga = (
-            self.find_similar(query_lga, self.lga_names, self.similarity_threshold, log_info)
+            self._find_similar_lga(query_lga, log_info, fuzzy_matches)
             if query_lga
             else None
         )
@@ -160,7 +721,13 @@ class PolicyMatcher:
         print(f"ERROR: {log_info}")
         return {"log_info": log_info}
 
-    def _search_by_lga(self, query_lga: str, log_info: List[str], query_state: Optional[str] = None) -> Dict:
+    def _search_by_lga(
+        self,
+        query_lga: str,
+        log_info: List[str],
+        query_state: Optional[str] = None,
+        fuzzy_matches: Optional[Dict] = None,
+    ) -> Dict:
         """仅根据 LGA 搜索，若提供 state 则也考虑 state"""
         self._log(f"_search_by_lga: Searching for LGA='{query_lga}', State='{query_state}'", log_info)
         
@@ -178,7 +745,7 @@ class PolicyMatcher:
             return self._build_lga_response(lga_match, match_type, log_info)
 
         # 尝试模糊匹配 LGA
-        fuzzy_lga = self.find_similar(query_lga, self.lga_names, self.similarity_threshold, log_info)
+        fuzzy_lga = self._find_similar_lga(query_lga, log_info, fuzzy_matches or {})
         if fuzzy_lga:
             lga_query = {"lga": fuzzy_lga[0]}
             if query_state:
@@ -259,6 +826,38 @@ class PolicyMatcher:
         )
 
 
+def _data_version() -> Tuple:
+    """参考数据源文件的 (mtime, size) 签名，用于判断是否需要重新加载"""
+    version = []
+    for name in TABLES:
+        stat = os.stat(_source_path(name))
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def get_policy_matcher() -> PolicyMatcher:
+    """
+    返回进程内共享的 PolicyMatcher（线程安全，首次调用时创建）。
+
+    参考数据源文件变化时创建新的实例并替换旧实例，正在使用旧实例的请求不受影响。
+    """
+    global _matcher, _matcher_version
+    version = _data_version()
+    matcher = _matcher
+    if matcher is not None and version == _matcher_version:
+        return matcher
+
+    with _matcher_lock:
+        # 其他线程可能已在等待锁期间完成重建，需在锁内重新读取签名
+        version = _data_version()
+        if _matcher is None or version != _matcher_version:
+            if _matcher is not None:
+                clear_table_cache()
+            _matcher = PolicyMatcher()
+            _matcher_version = version
+        return _matcher
+
+
 if __name__ == "__main__":
     matcher = PolicyMatcher()
     print("hello")
@@ -0,0 +1,101 @@
+"""
+Disk-backed cache of query extraction results.
+
+Entries are keyed on the normalised query text, the extraction model name and revision,
+and the extraction prompt template, so a cache hit needs no model at all. Entries expire
+after `ttl_seconds`, and the least recently used ones are evicted above `max_entries`.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import closing
+from typing import Optional
+
+from clear.prompt import generate_query_prompt
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTRACTION_CACHE_PATH = os.path.join(ROOT_DIR, "data", "cache", "extractions.sqlite")
+EXTRACTION_CACHE_TTL = 30 * 24 * 3600
+EXTRACTION_CACHE_MAX_ENTRIES = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    query TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extractions_accessed_at ON extractions (accessed_at);
+"""
+_WHITESPACE = re.compile(r"\s+")
+# A change to the extraction prompt invalidates every cached result
+_PROMPT_VERSION = hashlib.sha256(generate_query_prompt("").encode("utf-8")).hexdigest()[:16]
+
+
+def normalise_query(query: str) -> str:
+    """Unicode-normalise, case-fold and collapse whitespace; trailing punctuation is dropped."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!. ")
+
+
+def cache_key(query: str, model_name: str, revision: str) -> str:
+    payload = "\0".join((_PROMPT_VERSION, model_name, revision or "", normalise_query(query)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, ttl_seconds: float = EXTRACTION_CACHE_TTL,
+                 max_entries: int = EXTRACTION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, query: str, model_name: str, revision: str = None) -> Optional[dict]:
+        """Cached extraction for the query, or None on a miss or an expired entry."""
+        key = cache_key(query, model_name, revision)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT result, created_at FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE extractions SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, query: str, model_name: str, revision: str, result: dict):
+        """Store an extraction, then drop expired entries and the least recently used beyond max_entries."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, model, revision, query, result, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(query, model_name, revision), model_name, revision or "", query,
+                 json.dumps(result), now, now),
+            )
+            if self.ttl_seconds is not None:
+                conn.execute("DELETE FROM extractions WHERE created_at < ?", (now - self.ttl_seconds,))
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM extractions WHERE key IN "
+                    "(SELECT key FROM extractions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM extractions")
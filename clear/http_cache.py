@@ -0,0 +1,229 @@
+"""
+On-disk cache of remote API responses (Serper searches, Firecrawl scrapes).
+
+Entries are keyed on the source and a normalised request key and stored in SQLite.
+Each source has its own TTL. Past the TTL, an entry is still served for
+`STALE_WHILE_REVALIDATE` seconds while a background refresh runs, and it is used as a
+fallback if the remote call fails. The least recently used entries are evicted once
+the cache exceeds `max_bytes`. In offline mode only cached responses are served.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HTTP_CACHE_PATH = os.path.join(ROOT_DIR, "data", "cache", "http_cache.sqlite")
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Seconds a response stays fresh, per source
+SOURCE_TTLS = {
+    "serper": 7 * 24 * 3600,
+    "firecrawl": 30 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+STALE_WHILE_REVALIDATE = 7 * 24 * 3600
+
+FRESH, STALE, EXPIRED, MISS = "fresh", "stale", "expired", "miss"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    request TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+_WHITESPACE = re.compile(r"\s+")
+
+_offline = os.environ.get("CLEAR_OFFLINE", "") not in ("", "0")
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a response is not in the cache."""
+
+
+def set_offline(offline: bool = True):
+    """Serve only cached responses (also enabled by CLEAR_OFFLINE=1)."""
+    global _offline
+    _offline = offline
+
+
+def is_offline() -> bool:
+    return _offline
+
+
+def normalise_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query).strip().casefold()
+
+
+def normalise_url(url: str) -> str:
+    """Lowercase the scheme and host, and drop the fragment and a trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+class ResponseCache:
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="http-cache-revalidate")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _key(source: str, request: dict) -> Tuple[str, str]:
+        request_text = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(f"{source}\0{request_text}".encode("utf-8")).hexdigest(), request_text
+
+    def lookup(self, source: str, request: dict) -> Tuple[Optional[Any], str]:
+        """Return (value, state) where state is FRESH, STALE, EXPIRED or MISS."""
+        key, _ = self._key(source, request)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, MISS
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        age = now - row[1]
+        ttl = SOURCE_TTLS.get(source, DEFAULT_TTL)
+        state = FRESH if age <= ttl else STALE if age <= ttl + STALE_WHILE_REVALIDATE else EXPIRED
+        return json.loads(row[0]), state
+
+    def store(self, source: str, request: dict, value: Any):
+        """Store a response, then evict the least recently used entries beyond max_bytes."""
+        key, request_text = self._key(source, request)
+        value_text = json.dumps(value)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, source, request, value, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, source, request_text, value_text, len(value_text), now, now),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                freed = 0
+                evict = []
+                for row_key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    if total - freed <= self.max_bytes:
+                        break
+                    if row_key != key:
+                        evict.append((row_key,))
+                        freed += size
+                conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+    def revalidate(self, source: str, request: dict, fetch: Callable[[], Any]):
+        """Refresh an entry in the background; concurrent refreshes of the same entry are merged."""
+        key, _ = self._key(source, request)
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self.store(source, request, value)
+            except Exception as e:
+                print(f"Background refresh of {source} response failed: {e}")
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+
+        self._executor.submit(refresh)
+
+    def fetch(self, source: str, request: dict, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the cached response for the request, calling `fetch` on a miss.
+
+        `fetch` returns the value to cache, or None for a response that should not be cached.
+        A stale entry is returned at once and refreshed in the background, and an
+        expired entry is used if `fetch` fails. Offline, a miss raises OfflineCacheMiss.
+        """
+        value, state = self.lookup(source, request)
+        if state == FRESH or (state != MISS and is_offline()):
+            return value
+        if state == STALE:
+            self.revalidate(source, request, fetch)
+            return value
+        if is_offline():
+            raise OfflineCacheMiss(f"Offline mode: no cached {source} response for {request}")
+
+        try:
+            fresh_value = fetch()
+        except Exception:
+            if state == EXPIRED:
+                return value
+            raise
+        if fresh_value is not None:
+            self.store(source, request, fresh_value)
+        elif state == EXPIRED:
+            return value
+        return fresh_value
+
+    async def afetch(self, source: str, request: dict, fetch: Callable[[], Awaitable[Any]],
+                     refresh: Callable[[], Any]) -> Any:
+        """
+        Async counterpart of `fetch`: `fetch` is awaited on a miss or an expired entry,
+        while a stale entry is refreshed in the background with the synchronous `refresh`.
+        """
+        value, state = self.lookup(source, request)
+        if state == FRESH or (state != MISS and is_offline()):
+            return value
+        if state == STALE:
+            self.revalidate(source, request, refresh)
+            return value
+        if is_offline():
+            raise OfflineCacheMiss(f"Offline mode: no cached {source} response for {request}")
+
+        try:
+            fresh_value = await fetch()
+        except Exception:
+            if state == EXPIRED:
+                return value
+            raise
+        if fresh_value is not None:
+            self.store(source, request, fresh_value)
+        elif state == EXPIRED:
+            return value
+        return fresh_value
+
+    def clear(self, source: str = None):
+        with closing(self._connect()) as conn, conn:
+            if source is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute("DELETE FROM responses WHERE source = ?", (source,))
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache at HTTP_CACHE_PATH."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache()
+    return _default_cache
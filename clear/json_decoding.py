@@ -0,0 +1,347 @@
+"""
+Schema-constrained decoding for the query extraction model.
+
+`QueryExtractionLogitsProcessor` only lets the model emit tokens that keep the output a
+valid prefix of the object requested by `generate_query_prompt`:
+
+    {'rag_queries': [1-3 strings], 'topics': [1-3 strings],
+     'location': {'query_suburb': str|None, 'query_state': str|None, 'query_lga': str|None}}
+
+The model was fine-tuned on the Python repr of these dicts (single-quoted keys, strings
+quoted as repr quotes them, `None`), so that is the first accepted form; strict JSON
+(double quotes, `null`) is accepted as an alternative. The form is fixed by the first
+key, so the output never mixes the two and `extract_json_response` can always parse it.
+Once the closing brace is produced only the EOS token is allowed, so generation stops there.
+Requires the optional model dependencies (torch, transformers).
+
+    python -m clear.json_decoding --check-targets
+    python -m clear.json_decoding --evaluate --limit 100
+"""
+import argparse
+import ast
+import json
+import os
+import weakref
+
+import torch
+from transformers import LogitsProcessor
+
+MAX_WHITESPACE = 8
+MAX_STRING_CHARS = 160
+# Candidates checked per step before falling back to scanning the whole vocabulary
+TOP_K_CANDIDATES = 64
+_WHITESPACE = " \n\t"
+DATASET_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "query_model", "io_dataset_instruct.json"
+)
+
+_token_texts = weakref.WeakKeyDictionary()
+
+
+class _Literal:
+    """A fixed token such as '{' or "'topics'", optionally preceded by whitespace."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def start(self):
+        return (0, 0)
+
+    def step(self, sub, ch):
+        pos, ws = sub
+        if pos == 0 and ch in _WHITESPACE:
+            return ((0, ws + 1), False) if ws < MAX_WHITESPACE else None
+        if ch != self.text[pos]:
+            return None
+        return (pos + 1, ws), pos + 1 == len(self.text)
+
+
+class _String:
+    """
+    A non-empty string without escapes, opened by one of `quotes` and closed by the same
+    quote, or the `null` literal ("None" or "null") when nullable.
+    """
+
+    def __init__(self, quotes, null=None):
+        self.quotes = quotes
+        self.null = null
+
+    def start(self):
+        return ("before", 0, 0, None)
+
+    def step(self, sub, ch):
+        phase, n, ws, quote = sub
+        if phase == "before":
+            if ch in _WHITESPACE:
+                return (("before", 0, ws + 1, None), False) if ws < MAX_WHITESPACE else None
+            if ch in self.quotes:
+                return ("inside", 0, ws, ch), False
+            if self.null and ch == self.null[0]:
+                return ("null", 1, ws, None), False
+            return None
+        if phase == "inside":
+            if ch == quote:
+                return ((phase, n, ws, quote), True) if n > 0 else None
+            if ch == "\\" or ord(ch) < 0x20 or n >= MAX_STRING_CHARS:
+                return None
+            return ("inside", n + 1, ws, quote), False
+        # phase == "null"
+        if ch != self.null[n]:
+            return None
+        return ("null", n + 1, ws, None), n + 1 == len(self.null)
+
+
+class _StringArray:
+    """An array of between min_items and max_items strings."""
+
+    def __init__(self, min_items, max_items, item):
+        self.min_items = min_items
+        self.max_items = max_items
+        self.item = item
+
+    def start(self):
+        return ("open", 0, 0, None)
+
+    def step(self, sub, ch):
+        phase, count, ws, item_sub = sub
+        if phase == "open":
+            if ch in _WHITESPACE:
+                return (("open", 0, ws + 1, None), False) if ws < MAX_WHITESPACE else None
+            return (("item", 0, 0, self.item.start()), False) if ch == "[" else None
+        if phase == "item":
+            result = self.item.step(item_sub, ch)
+            if result is None:
+                return None
+            item_sub, complete = result
+            if complete:
+                return ("after", count + 1, 0, None), False
+            return ("item", count, 0, item_sub), False
+        # phase == "after": a comma for another item or the closing bracket
+        if ch in _WHITESPACE:
+            return (("after", count, ws + 1, None), False) if ws < MAX_WHITESPACE else None
+        if ch == "," and count < self.max_items:
+            return ("item", count, 0, self.item.start()), False
+        if ch == "]" and count >= self.min_items:
+            return (phase, count, ws, None), True
+        return None
+
+
+def _query_extraction_schema(key_quote, string_quotes, null, location_fields):
+    def key(name):
+        return _Literal(f"{key_quote}{name}{key_quote}")
+
+    elements = [_Literal("{")]
+    for index, name in enumerate(("rag_queries", "topics")):
+        if index:
+            elements.append(_Literal(","))
+        elements += [key(name), _Literal(":"), _StringArray(1, 3, _String(string_quotes))]
+    elements += [_Literal(","), key("location"), _Literal(":"), _Literal("{")]
+    for index, name in enumerate(location_fields):
+        if index:
+            elements.append(_Literal(","))
+        elements += [key(name), _Literal(":"), _String(string_quotes, null=null)]
+    elements += [_Literal("}"), _Literal("}")]
+    return elements
+
+
+# The training targets list the location fields in one of these two orders
+LOCATION_FIELD_ORDERS = (("query_suburb", "query_state", "query_lga"), ("query_suburb", "query_lga", "query_state"))
+# Python repr as in the training targets (repr double-quotes strings that contain a "'"), then JSON
+QUERY_EXTRACTION_SCHEMAS = tuple(
+    _query_extraction_schema(key_quote, string_quotes, null, fields)
+    for key_quote, string_quotes, null in (("'", "'\"", "None"), ('"', '"', "null"))
+    for fields in LOCATION_FIELD_ORDERS
+)
+
+
+def _advance_schema(state, text, elements):
+    index, sub = state
+    for ch in text:
+        if index == len(elements):
+            return None
+        result = elements[index].step(sub, ch)
+        if result is None:
+            return None
+        sub, complete = result
+        if complete:
+            index += 1
+            sub = elements[index].start() if index < len(elements) else None
+    return index, sub
+
+
+def advance(state, text, schemas=QUERY_EXTRACTION_SCHEMAS):
+    """
+    Feed text to the schema automata, one per accepted form.
+
+    Returns:
+        The new state (one `(element index, sub-state)` or None per schema), or None if
+        the text cannot continue any accepted output.
+    """
+    new_state = tuple(
+        None if schema_state is None else _advance_schema(schema_state, text, elements)
+        for schema_state, elements in zip(state, schemas)
+    )
+    return new_state if any(schema_state is not None for schema_state in new_state) else None
+
+
+def initial_state(schemas=QUERY_EXTRACTION_SCHEMAS):
+    return tuple((0, elements[0].start()) for elements in schemas)
+
+
+def is_complete(state, schemas=QUERY_EXTRACTION_SCHEMAS):
+    return any(
+        schema_state is not None and schema_state[0] == len(elements)
+        for schema_state, elements in zip(state, schemas)
+    )
+
+
+def get_token_texts(tokenizer):
+    """Text of every token id as it appears in decoded output, computed once per tokenizer."""
+    texts = _token_texts.get(tokenizer)
+    if texts is None:
+        tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+        special_ids = set(tokenizer.all_special_ids)
+        texts = [
+            "" if token is None or token_id in special_ids else tokenizer.convert_tokens_to_string([token])
+            for token_id, token in enumerate(tokens)
+        ]
+        _token_texts[tokenizer] = texts
+    return texts
+
+
+class QueryExtractionLogitsProcessor(LogitsProcessor):
+    """
+    Mask every token that would break the query extraction schema.
+
+    Each row's automaton state is advanced with the token generated at the previous
+    step. A new processor must be used for each `generate` call.
+    """
+
+    def __init__(self, tokenizer, schemas=QUERY_EXTRACTION_SCHEMAS, top_k=TOP_K_CANDIDATES):
+        self.schemas = schemas
+        self.token_texts = get_token_texts(tokenizer)
+        self.eos_token_id = tokenizer.eos_token_id
+        self.top_k = top_k
+        self.prompt_length = None
+        self.states = None
+
+    def _valid(self, state, token_id):
+        if token_id == self.eos_token_id or token_id >= len(self.token_texts):
+            return False
+        text = self.token_texts[token_id]
+        return bool(text) and advance(state, text, self.schemas) is not None
+
+    def _allowed_tokens(self, state, row_scores):
+        if is_complete(state, self.schemas):
+            return [self.eos_token_id]
+        # The model almost always ranks a valid token near the top; only scan further when it does not
+        top_ids = torch.topk(row_scores, min(self.top_k, row_scores.shape[-1])).indices.tolist()
+        allowed = [token_id for token_id in top_ids if self._valid(state, token_id)]
+        if allowed:
+            return allowed
+        for token_id in torch.argsort(row_scores, descending=True).tolist()[len(top_ids):]:
+            if self._valid(state, token_id):
+                return [token_id]
+        return [self.eos_token_id]
+
+    def __call__(self, input_ids, scores):
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+            self.states = [initial_state(self.schemas) for _ in range(input_ids.shape[0])]
+        elif input_ids.shape[1] > self.prompt_length:
+            for row, token_id in enumerate(input_ids[:, -1].tolist()):
+                state = self.states[row]
+                if state is not None and not is_complete(state, self.schemas):
+                    self.states[row] = advance(state, self.token_texts[token_id], self.schemas)
+
+        mask = torch.full_like(scores, float("-inf"))
+        for row, state in enumerate(self.states):
+            # A finished row only needs padding; a row that left the schema is left unconstrained
+            allowed = self._allowed_tokens(state, scores[row]) if state is not None else None
+            if allowed is None:
+                mask[row] = 0
+            else:
+                mask[row, allowed] = 0
+        return scores + mask
+
+
+# -------------------------------------------------------
+# Checks against the fine-tuning data
+# -------------------------------------------------------
+def load_dataset(path=DATASET_PATH):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def check_targets(dataset):
+    """
+    Feed every training target, as the model saw it (`str` of the output dict) and as
+    JSON, through the automaton.
+
+    Returns:
+        dict: Number of targets and of targets rejected in each form.
+    """
+    rejected = {"python": 0, "json": 0}
+    for row in dataset:
+        for form, text in (("python", str(row["output"])), ("json", json.dumps(row["output"], ensure_ascii=False))):
+            state = advance(initial_state(), text)
+            if state is None or not is_complete(state):
+                rejected[form] += 1
+    return {"targets": len(dataset), "rejected": rejected}
+
+
+def score_extractions(dataset, extractions):
+    """Parse rate and per-field location accuracy of extractions against the training targets."""
+    parsed = [extraction for extraction in extractions if extraction]
+    correct = {field: 0 for field in LOCATION_FIELD_ORDERS[0]}
+    placeholder_strings = 0
+    for row, extraction in zip(dataset, extractions):
+        if not extraction:
+            continue
+        location = extraction.get("location") or {}
+        for field in LOCATION_FIELD_ORDERS[0]:
+            value = location.get(field)
+            if value == row["output"]["location"][field]:
+                correct[field] += 1
+            if isinstance(value, str) and value.strip().lower() in ("none", "null"):
+                placeholder_strings += 1
+    return {
+        "parsed": f"{len(parsed)}/{len(extractions)}",
+        "location_accuracy": {field: round(count / len(dataset), 3) for field, count in correct.items()},
+        "none_as_string": placeholder_strings,
+    }
+
+
+def evaluate(dataset, model_name=None, device=None, batch_size=8):
+    """Run the extraction model over the dataset inputs with and without constrained decoding."""
+    import main
+    from clear.load_model import load_model_and_tokenizer
+
+    model, tokenizer, device = load_model_and_tokenizer(
+        model_name or main.EXTRACTION_MODEL_NAME, device=device, revision=main.EXTRACTION_MODEL_REVISION
+    )
+    queries = [row["input"] for row in dataset]
+    return {
+        mode: score_extractions(dataset, main.generate_extraction_batch(
+            queries, model, tokenizer, device, batch_size=batch_size, max_retries=0, constrained=constrained
+        ))
+        for mode, constrained in (("unconstrained", False), ("constrained", True))
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the extraction schema against io_dataset_instruct.json.")
+    parser.add_argument("--dataset", type=str, default=DATASET_PATH)
+    parser.add_argument("--check-targets", action="store_true", help="Check the automaton accepts every target.")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Compare constrained and unconstrained extraction with the model.")
+    parser.add_argument("--model_name", type=str, default=None)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N rows.")
+    args = parser.parse_args()
+
+    rows = load_dataset(args.dataset)[:args.limit]
+    if args.check_targets or not args.evaluate:
+        print(check_targets(rows))
+    if args.evaluate:
+        print(evaluate(rows, model_name=args.model_name, device=args.device))
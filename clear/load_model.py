@@ -1,11 +1,24 @@
-def load_model_and_tokenizer(model_name: str = "oscarwu/Llama-3.2-3B-CLEAR", device: str = None):
+import argparse
+import sys
+import time
+
+# CPU 推理可选的数据类型："int8" 表示加载 float32 后对 Linear 层做动态 int8 量化
+CPU_DTYPES = ("float32", "bfloat16", "int8")
+
+
+def load_model_and_tokenizer(model_name: str = "oscarwu/Llama-3.2-3B-CLEAR", device: str = None, revision: str = None,
+                             cpu_dtype: str = "float32", num_threads: int = None, compile_model: bool = False):
     """
     加载指定的模型和分词器。
-    
+
     Args:
         model_name (str): 模型名称，默认为 "oscarwu/Llama-3.2-3B-CLEAR"
         device (str, optional): 使用的设备（例如 "cuda", "mps", "cpu"）。如果为 None，则自动检测可用设备。
-        
+        revision (str, optional): 模型版本（分支名、标签或提交哈希），默认为最新版本。
+        cpu_dtype (str): 在 CPU 上使用的数据类型："float32"、"bfloat16" 或 "int8"（动态量化）。
+        num_threads (int, optional): CPU 推理使用的线程数（torch.set_num_threads），None 表示使用 torch 默认值。
+        compile_model (bool): 是否用 torch.compile 编译模型的 forward。
+
     Returns:
         tuple: (model, tokenizer, device) 加载好的模型、分词器和实际使用的设备字符串。
     """
@@ -18,6 +31,9 @@ def load_model_and_tokenizer(model_name: str = "oscarwu/Llama-3.2-3B-CLEAR", dev
             "Install them with `uv sync --extra model` before running model inference."
         ) from exc
 
+    if cpu_dtype not in CPU_DTYPES:
+        raise ValueError(f"cpu_dtype must be one of {CPU_DTYPES}, got {cpu_dtype!r}")
+
     # 如果没有提供 device 参数，则自动判断可用设备
     if device is None:
         if torch.cuda.is_available():
@@ -26,43 +42,128 @@ def load_model_and_tokenizer(model_name: str = "oscarwu/Llama-3.2-3B-CLEAR", dev
             device = "mps"
         else:
             device = "cpu"
-    
+
+    if device == "cpu" and num_threads:
+        torch.set_num_threads(num_threads)
+
     # 加载分词器
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+
     # 根据设备选择合适的数据类型
-    model_dtype = torch.float16 if device == "mps" else torch.float32
-    # 加载模型，并将其移动到指定设备上
+    if device == "mps":
+        model_dtype = torch.float16
+    elif device == "cpu" and cpu_dtype == "bfloat16":
+        model_dtype = torch.bfloat16
+    else:
+        model_dtype = torch.float32
+    # 加载模型，并将其移动到指定设备上；low_cpu_mem_usage 直接从 safetensors 按需读取权重，避免先构建一份随机初始化的模型
     model = AutoModelForCausalLM.from_pretrained(
         model_name,
+        revision=revision,
         device_map={"": device},
         torch_dtype=model_dtype,
+        low_cpu_mem_usage=True,
     )
     model.to(device)
-    
+    model.eval()
+
+    if device == "cpu" and cpu_dtype == "int8":
+        # 动态量化：Linear 权重存为 int8，激活在运行时量化
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if compile_model:
+        # 只编译 forward，generate 仍然走 transformers 的生成循环
+        model.forward = torch.compile(model.forward, dynamic=True)
+
     return model, tokenizer, device
 
+
+def _peak_rss_mb():
+    """进程的峰值常驻内存（MB），在没有 resource 模块的平台（Windows）上返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark(model, tokenizer, device, prompt, max_new_tokens=128, runs=3):
+    """
+    测量生成吞吐量。
+
+    Returns:
+        dict: 首次（预热）生成耗时、之后每次生成的平均耗时、平均每秒生成 token 数和峰值内存。
+    """
+    import torch
+
+    inputs = tokenizer(prompt, return_tensors="pt").to(device)
+    prompt_length = inputs["input_ids"].shape[1]
+    timings = []
+    new_tokens = 0
+    with torch.inference_mode():
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False,
+                                     pad_token_id=tokenizer.eos_token_id)
+            timings.append(time.perf_counter() - start)
+            new_tokens = outputs.shape[1] - prompt_length
+    mean_seconds = sum(timings[1:]) / runs
+    peak_rss_mb = _peak_rss_mb()
+    return {
+        "warmup_seconds": round(timings[0], 3),
+        "mean_generate_seconds": round(mean_seconds, 3),
+        "new_tokens": int(new_tokens),
+        "tokens_per_second": round(new_tokens / mean_seconds, 2),
+        "peak_rss_mb": None if peak_rss_mb is None else round(peak_rss_mb, 1),
+    }
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the query extraction model and run a test query.")
+    parser.add_argument("--model_name", type=str, default="oscarwu/Llama-3.2-3B-CLEAR")
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--cpu_dtype", type=str, default="float32", choices=CPU_DTYPES)
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--benchmark", action="store_true", help="Report load time, peak RSS and tokens/sec.")
+    parser.add_argument("--max_new_tokens", type=int, default=128)
+    args = parser.parse_args()
+
     # 调用函数加载模型和分词器
-    model, tokenizer, device = load_model_and_tokenizer()
-    
+    load_start = time.perf_counter()
+    model, tokenizer, device = load_model_and_tokenizer(
+        model_name=args.model_name,
+        device=args.device,
+        cpu_dtype=args.cpu_dtype,
+        num_threads=args.num_threads,
+        compile_model=args.compile,
+    )
+    load_seconds = time.perf_counter() - load_start
+
     # 示例查询
     query = "How is Dubbo, NSW supporting farmers with drought-resistant crops?"
-    from clear.generate_prompt import generate_query_prompt
+    from clear.prompt import generate_query_prompt
     test_prompt = generate_query_prompt(query)
-    
-    # 对生成的 prompt 进行编码，准备输入给模型
-    inputs = tokenizer(
-        test_prompt,
-        padding=True,
-        truncation=True,
-        max_length=1024,
-        return_tensors="pt"
-    ).to(device)
-    
-    # 使用模型生成输出（设置最大新生成的 token 数为 128）
-    outputs = model.generate(**inputs, max_new_tokens=128, use_cache=True)
-    
-    # 解码输出 token 为文本
-    test_result = tokenizer.batch_decode(outputs)
-    print(test_result)
+
+    if args.benchmark:
+        results = {"device": device, "cpu_dtype": args.cpu_dtype, "load_seconds": round(load_seconds, 3)}
+        results.update(benchmark(model, tokenizer, device, test_prompt, max_new_tokens=args.max_new_tokens))
+        print(results)
+    else:
+        # 对生成的 prompt 进行编码，准备输入给模型
+        inputs = tokenizer(
+            test_prompt,
+            padding=True,
+            truncation=True,
+            max_length=1024,
+            return_tensors="pt"
+        ).to(device)
+
+        # 使用模型生成输出
+        outputs = model.generate(**inputs, max_new_tokens=args.max_new_tokens, use_cache=True)
+
+        # 解码输出 token 为文本
+        test_result = tokenizer.batch_decode(outputs)
+        print(test_result)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+BM25 index over the pages of the policy PDFs in data/pdf_lga.
+
+The index keeps per-page postings and is persisted to data/cache/policy_index.pkl.
+Building it is an offline step: refreshing only re-parses PDFs whose size or mtime
+changed since the last build, and the report pipeline just loads the saved index.
+
+    python -m clear.policy_index build
+    python -m clear.policy_index query "water efficiency programs" -k 5
+"""
+import argparse
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from PyPDF2 import PdfReader
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_DIR = os.path.join(ROOT_DIR, "data", "pdf_lga")
+INDEX_PATH = os.path.join(ROOT_DIR, "data", "cache", "policy_index.pkl")
+INDEX_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+_WORD_PATTERN = re.compile(r"[a-z][a-z0-9]{2,}")
+_STOPWORDS = frozenset(
+    "the and for are was were what which with this that from into our their there these those "
+    "have has had how who why when where will would should could can not any all its per".split()
+)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Lowercase word tokens of at least three characters, without stopwords."""
+    return [word for word in _WORD_PATTERN.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def page_size(page):
+    """Page size in points, with width and height swapped for rotated pages."""
+    width, height = float(page.mediabox.width), float(page.mediabox.height)
+    if page.get("/Rotate", 0) % 180:
+        width, height = height, width
+    return width, height
+
+
+def extract_pages(pdf_path):
+    """
+    Extract the pages of a PDF for indexing.
+
+    Returns:
+        list of dict: One entry per page with 'terms' (term counts) and 'size' (points).
+    """
+    pages = []
+    for page in PdfReader(pdf_path).pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+        pages.append({"terms": Counter(tokenize(text)), "size": page_size(page)})
+    return pages
+
+
+class PolicyIndex:
+    """
+    BM25 page index. An instance is not modified after it is built; `refreshed` returns
+    a new index, so searches running on the old one always see consistent arrays.
+    """
+
+    def __init__(self, pdf_dir=PDF_DIR, files=None):
+        self.pdf_dir = pdf_dir
+        # pdf file name -> {"signature": (size, mtime_ns), "pages": [...]} as from extract_pages
+        self.files = files or {}
+        self._build_postings()
+
+    def refreshed(self, extract=extract_pages):
+        """
+        Return an index brought up to date with pdf_dir, re-parsing only new or changed
+        PDFs and dropping removed ones. Returns this index itself if nothing changed.
+        """
+        names = sorted(name for name in os.listdir(self.pdf_dir) if name.lower().endswith(".pdf"))
+        files = {name: self.files[name] for name in names if name in self.files}
+        changed = len(files) != len(self.files)
+
+        for name in names:
+            path = os.path.join(self.pdf_dir, name)
+            signature = _file_signature(path)
+            entry = files.get(name)
+            if entry is not None and entry["signature"] == signature:
+                continue
+            try:
+                pages = extract(path)
+            except Exception as e:
+                print(f"Error indexing {path}: {e}")
+                pages = []
+            files[name] = {"signature": signature, "pages": pages}
+            changed = True
+
+        return PolicyIndex(self.pdf_dir, files) if changed else self
+
+    def _build_postings(self):
+        """Build the page table and the term -> (page ids, term frequencies) postings."""
+        self.page_refs = []
+        self.page_sizes = []
+        postings = {}
+        lengths = []
+        for name in sorted(self.files):
+            for page_number, page in enumerate(self.files[name]["pages"], start=1):
+                page_id = len(self.page_refs)
+                self.page_refs.append((name, page_number))
+                self.page_sizes.append(page["size"])
+                lengths.append(sum(page["terms"].values()))
+                for term, count in page["terms"].items():
+                    postings.setdefault(term, ([], []))
+                    postings[term][0].append(page_id)
+                    postings[term][1].append(count)
+
+        self.page_lengths = np.asarray(lengths, dtype=np.float64)
+        self.avg_length = float(self.page_lengths.mean()) if lengths and self.page_lengths.mean() > 0 else 1.0
+        self.postings = {
+            term: (np.asarray(ids, dtype=np.int32), np.asarray(counts, dtype=np.float64))
+            for term, (ids, counts) in postings.items()
+        }
+        self.page_ids = {ref: page_id for page_id, ref in enumerate(self.page_refs)}
+
+    def score(self, query):
+        """BM25 score of every indexed page for the query."""
+        n_pages = len(self.page_refs)
+        scores = np.zeros(n_pages, dtype=np.float64)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.page_lengths / self.avg_length)
+        for term, query_count in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, counts = posting
+            idf = math.log(1 + (n_pages - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += query_count * idf * counts * (BM25_K1 + 1) / (counts + norm[ids])
+        return scores
+
+    def page_id(self, pdf_path, page_number):
+        return self.page_ids.get((os.path.basename(pdf_path), page_number))
+
+    def pages_of(self, pdf_path):
+        """Page numbers indexed for a PDF, empty if the PDF is not indexed."""
+        entry = self.files.get(os.path.basename(pdf_path))
+        return range(1, len(entry["pages"]) + 1) if entry else range(0)
+
+    def covers(self, pdf_path):
+        """Whether the PDF is indexed with pages and has not changed since it was indexed."""
+        entry = self.files.get(os.path.basename(pdf_path))
+        if not entry or not entry["pages"]:
+            return False
+        try:
+            return entry["signature"] == _file_signature(pdf_path)
+        except OSError:
+            return False
+
+    def indexed_pages(self, pdf_path):
+        """The indexed pages of a PDF as from extract_pages ('terms' and 'size')."""
+        entry = self.files.get(os.path.basename(pdf_path))
+        return entry["pages"] if entry else []
+
+    def search(self, query, k=10, pdf_paths=None):
+        """
+        Return the top-k pages for the query, optionally restricted to some PDFs.
+
+        Args:
+            query (str or list of str): Query text, or several queries scored together.
+            k (int): Number of pages to return.
+            pdf_paths (list of str, optional): Only rank pages of these PDFs.
+
+        Returns:
+            list of dict: Matching pages with 'pdf_path', 'page' and 'score', best first.
+        """
+        if not isinstance(query, str):
+            query = " ".join(query)
+        scores = self.score(query)
+        if pdf_paths is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            for pdf_path in pdf_paths:
+                for page_number in self.pages_of(pdf_path):
+                    allowed[self.page_id(pdf_path, page_number)] = True
+            scores = np.where(allowed, scores, -np.inf)
+
+        k = min(k, int((scores > 0).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            {
+                "pdf_path": os.path.join(self.pdf_dir, self.page_refs[page_id][0]),
+                "page": self.page_refs[page_id][1],
+                "score": float(scores[page_id]),
+            }
+            for page_id in top
+        ]
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump({"version": INDEX_VERSION, "pdf_dir": self.pdf_dir, "files": self.files},
+                        file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, pdf_dir=PDF_DIR):
+        """Load a saved index, or return an empty one if there is none for pdf_dir."""
+        try:
+            with open(path, "rb") as file:
+                payload = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return cls(pdf_dir)
+        if payload.get("version") == INDEX_VERSION and payload.get("pdf_dir") == pdf_dir:
+            return cls(pdf_dir, payload["files"])
+        return cls(pdf_dir)
+
+
+def get_policy_index(refresh=False):
+    """
+    Process-wide policy index, loaded from disk. With refresh=True it is first brought
+    up to date with data/pdf_lga and saved; the refreshed index replaces the shared one
+    in a single assignment.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PolicyIndex.load()
+        if refresh:
+            index = _index.refreshed()
+            if index is not _index:
+                index.save()
+                _index = index
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the policy page index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Index new or changed PDFs in data/pdf_lga.")
+    query_parser = subparsers.add_parser("query", help="Show the top pages for a query.")
+    query_parser.add_argument("query", type=str)
+    query_parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = get_policy_index(refresh=args.command == "build")
+    if args.command == "build":
+        print(f"Indexed {len(index.page_refs)} pages from {len(index.files)} PDFs into {INDEX_PATH}")
+    else:
+        for hit in index.search(args.query, k=args.k):
+            print(f"{hit['score']:8.3f}  {os.path.basename(hit['pdf_path'])}  page {hit['page']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Incremental per-page text store for the policy PDFs in data/pdf_lga.
+
+Each PDF is keyed on (pdf_path, size, mtime, sha256). Syncing only parses new or
+changed PDFs, and PDFs that disappeared are tombstoned. Serving a policy's text is
+then a SQLite lookup instead of a PDF parse.
+
+    python -m clear.policy_store sync [--index]
+    python -m clear.policy_store stats
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from typing import Dict, List, Optional
+
+from PyPDF2 import PdfReader
+
+from clear.policy_index import PDF_DIR, ROOT_DIR, PolicyIndex, page_size, tokenize
+from utilize import count_tokens_batch
+
+STORE_PATH = os.path.join(ROOT_DIR, "data", "cache", "policy_text.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    pdf_path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    token_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pages (
+    pdf_path TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL,
+    PRIMARY KEY (pdf_path, page)
+);
+"""
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_pdf(path):
+    """Extract (text, width, height) per page; runs in a worker process."""
+    pages = []
+    for page in PdfReader(path).pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+        pages.append((text, *page_size(page)))
+    return pages
+
+
+class PolicyTextStore:
+    def __init__(self, path: str = STORE_PATH, pdf_dir: str = PDF_DIR):
+        self.path = path
+        self.pdf_dir = pdf_dir
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _key(self, pdf_path):
+        """Documents are keyed on their path relative to pdf_dir."""
+        return os.path.relpath(os.path.abspath(pdf_path), self.pdf_dir)
+
+    def sync(self, workers: int = None) -> Dict[str, int]:
+        """
+        Bring the store up to date with pdf_dir. Only PDFs whose size or mtime changed
+        are hashed, and only PDFs whose content changed are parsed.
+
+        Returns:
+            dict: Counts of 'added', 'updated', 'touched', 'unchanged', 'failed' and 'removed' PDFs.
+        """
+        summary = dict.fromkeys(("added", "updated", "touched", "unchanged", "failed", "removed"), 0)
+        names = sorted(name for name in os.listdir(self.pdf_dir) if name.lower().endswith(".pdf"))
+
+        with closing(self._connect()) as conn:
+            known = {
+                row[0]: row[1:]
+                for row in conn.execute("SELECT pdf_path, size, mtime_ns, sha256, deleted FROM documents")
+            }
+            to_parse = []
+            with conn:
+                for name in names:
+                    stat = os.stat(os.path.join(self.pdf_dir, name))
+                    row = known.get(name)
+                    if row is not None and not row[3] and row[:2] == (stat.st_size, stat.st_mtime_ns):
+                        summary["unchanged"] += 1
+                        continue
+                    sha256 = _file_sha256(os.path.join(self.pdf_dir, name))
+                    if row is not None and not row[3] and row[2] == sha256:
+                        # Same content under a new mtime: only record the new signature
+                        conn.execute(
+                            "UPDATE documents SET size = ?, mtime_ns = ? WHERE pdf_path = ?",
+                            (stat.st_size, stat.st_mtime_ns, name),
+                        )
+                        summary["touched"] += 1
+                        continue
+                    to_parse.append((name, stat, sha256, "updated" if row is not None and not row[3] else "added"))
+
+                present = set(names)
+                removed = [name for name, row in known.items() if not row[3] and name not in present]
+                for name in removed:
+                    conn.execute("UPDATE documents SET deleted = 1, updated_at = ? WHERE pdf_path = ?", (time.time(), name))
+                    conn.execute("DELETE FROM pages WHERE pdf_path = ?", (name,))
+                summary["removed"] = len(removed)
+
+            paths = [os.path.join(self.pdf_dir, name) for name, *_ in to_parse]
+            if len(paths) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_safe_parse_pdf, paths))
+            else:
+                results = [_safe_parse_pdf(path) for path in paths]
+
+            for (name, stat, sha256, status), pages in zip(to_parse, results):
+                if pages is None:
+                    summary["failed"] += 1
+                    continue
+                token_counts = count_tokens_batch([text for text, _, _ in pages]) if pages else []
+                with conn:
+                    conn.execute("DELETE FROM pages WHERE pdf_path = ?", (name,))
+                    conn.executemany(
+                        "INSERT INTO pages (pdf_path, page, text, token_count, width, height) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (name, page_number, text, tokens, width, height)
+                            for page_number, ((text, width, height), tokens) in enumerate(zip(pages, token_counts), start=1)
+                        ],
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents "
+                        "(pdf_path, size, mtime_ns, sha256, page_count, token_count, updated_at, deleted) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                        (name, stat.st_size, stat.st_mtime_ns, sha256, len(pages), sum(token_counts), time.time()),
+                    )
+                summary[status] += 1
+        return summary
+
+    def _fresh_key(self, conn, pdf_path):
+        """The document key if the stored text matches the file on disk, else None."""
+        key = self._key(pdf_path)
+        row = conn.execute(
+            "SELECT size, mtime_ns FROM documents WHERE pdf_path = ? AND deleted = 0", (key,)
+        ).fetchone()
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        if row is None or tuple(row) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return key
+
+    def get_pages(self, pdf_path: str) -> Optional[List[dict]]:
+        """
+        Stored pages of a PDF, or None if the PDF is not stored or changed since the last sync.
+
+        Returns:
+            list of dict: Pages with 'page', 'text', 'token_count' and 'size' (points).
+        """
+        with closing(self._connect()) as conn:
+            key = self._fresh_key(conn, pdf_path)
+            if key is None:
+                return None
+            rows = conn.execute(
+                "SELECT page, text, token_count, width, height FROM pages WHERE pdf_path = ? ORDER BY page", (key,)
+            ).fetchall()
+        return [
+            {"page": page, "text": text, "token_count": tokens, "size": (width, height)}
+            for page, text, tokens, width, height in rows
+        ]
+
+    def get_document(self, pdf_path: str) -> Optional[dict]:
+        """
+        Full text and token count of a PDF, or None if it is not stored or is stale.
+
+        Returns:
+            dict: 'text' (pages joined with newlines) and 'token_count'.
+        """
+        pages = self.get_pages(pdf_path)
+        if pages is None:
+            return None
+        return {
+            "text": "\n".join(page["text"] for page in pages),
+            "token_count": sum(page["token_count"] for page in pages),
+        }
+
+    def index_pages(self, pdf_path: str) -> List[dict]:
+        """Pages of a PDF in the form `PolicyIndex.refresh` expects, parsing it if not stored."""
+        pages = self.get_pages(pdf_path)
+        if pages is None:
+            return [
+                {"terms": Counter(tokenize(text)), "size": (width, height)}
+                for text, width, height in _parse_pdf(pdf_path)
+            ]
+        return [{"terms": Counter(tokenize(page["text"])), "size": page["size"]} for page in pages]
+
+    def stats(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            documents, deleted, tokens = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0), COALESCE(SUM(token_count), 0) FROM documents"
+            ).fetchone()
+            pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"documents": documents - deleted, "tombstones": deleted, "pages": pages, "tokens": tokens}
+
+
+def _safe_parse_pdf(path):
+    try:
+        return _parse_pdf(path)
+    except Exception as e:
+        print(f"Error processing {path}: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-page policy text store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="Extract new or changed PDFs and tombstone removed ones.")
+    sync_parser.add_argument("--workers", type=int, default=None, help="Number of extraction processes.")
+    sync_parser.add_argument("--index", action="store_true", help="Also refresh the BM25 page index.")
+    subparsers.add_parser("stats", help="Show store statistics.")
+    args = parser.parse_args()
+
+    store = PolicyTextStore()
+    if args.command == "sync":
+        start = time.perf_counter()
+        summary = store.sync(workers=args.workers)
+        print(f"Synced {STORE_PATH} in {time.perf_counter() - start:.2f}s: {summary}")
+        if args.index:
+            saved_index = PolicyIndex.load()
+            index = saved_index.refreshed(extract=store.index_pages)
+            if index is not saved_index:
+                index.save()
+            print(f"Indexed {len(index.page_refs)} pages from {len(index.files)} PDFs")
+    else:
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Bulk prefetch of the Wikipedia search results used by the report pipeline.
+
+All LGA (and optionally suburb) lookups go out through `SerperSearch.search_many`, so
+warming every LGA takes a handful of batch requests instead of one request per LGA.
+The results are stored in the response cache (clear/http_cache.py), where
+`fetch_additional_variables` finds them through the same `search_many` call.
+
+    python -m clear.prefetch --states WA NSW --suburbs
+"""
+import argparse
+from typing import Dict, Iterable, List
+
+from clear.db import load_table
+from clear.http_cache import HTTP_CACHE_PATH
+from clear.search import SerperSearch, wikipedia_query
+
+
+def wikipedia_queries(states: Iterable[str] = None, include_suburbs: bool = False) -> List[str]:
+    """Wikipedia queries for every LGA (and suburb) in the reference tables, optionally limited to some states."""
+    states = {state.upper() for state in states} if states else None
+    queries = [
+        wikipedia_query(record["lga"], record["state"], "lga")
+        for record in load_table("lga")
+        if states is None or str(record["state"]).upper() in states
+    ]
+    if include_suburbs:
+        queries += [
+            wikipedia_query(record["suburb"], record["state"], "suburb")
+            for record in load_table("suburbs")
+            if states is None or str(record["state"]).upper() in states
+        ]
+    return list(dict.fromkeys(queries))
+
+
+def prefetch_wikipedia_searches(queries: List[str], searcher: SerperSearch = None, k: int = 1) -> Dict[str, Dict]:
+    """Run the queries through batched Serper searches and map each query to its result."""
+    searcher = searcher or SerperSearch()
+    return dict(zip(queries, searcher.search_many(queries, k=k)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch the Wikipedia searches for LGAs and suburbs.")
+    parser.add_argument("--states", nargs="*", default=None, help="Only these states (e.g. WA NSW).")
+    parser.add_argument("--suburbs", action="store_true", help="Also prefetch suburb searches.")
+    args = parser.parse_args()
+
+    queries = wikipedia_queries(args.states, args.suburbs)
+    batches = -(-len(queries) // SerperSearch().config.BATCH_LIMIT)
+    print(f"Prefetching {len(queries)} searches in {batches} batch requests...")
+    results = prefetch_wikipedia_searches(queries)
+    print(f"Cached {len(results)} search results in {HTTP_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,443 @@
-
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PyPDF2 import PdfReader
+from clear.policy_index import page_size, tokenize
 import io
 import base64
+import hashlib
+import json
+import math
+import os
+import shutil
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Rendered policy pages are cached here, one directory per (PDF, mtime, size, DPI, format)
+PAGE_CACHE_DIR = os.path.join(ROOT_DIR, "data", "cache", "page_images")
+DEFAULT_DPI = 200
+# Pages are rendered this many at a time so memory stays flat for long documents
+RENDER_CHUNK_PAGES = 8
+RENDER_THREADS = min(4, os.cpu_count() or 1)
+# Pages larger than this many pixels are downsized before encoding
+DEFAULT_MAX_PIXELS = 2048 * 2048
+DEFAULT_QUALITY = 85
+IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+IMAGE_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Budget for the policy page images attached to the document analysis prompt
+IMAGE_TOKEN_BUDGET = 60000
+IMAGE_BYTE_BUDGET = 20 * 1024 * 1024
+# High-detail image pricing: the image is fitted into 2048x2048, its short side scaled
+# to 768 and it is billed per 512px tile plus a base cost
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+
+
+def _page_cache_entry(pdf_path, dpi, fmt, cache_dir, max_pixels=None, quality=DEFAULT_QUALITY):
+    """
+    Return the cache directory for a PDF rendered with the given settings.
+
+    Entries are grouped under a directory per PDF path so that stale renders of an
+    older version of the same file can be removed when a new one is written.
+    """
+    abs_path = os.path.abspath(pdf_path)
+    stat = os.stat(abs_path)
+    path_key = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()[:16]
+    version_key = hashlib.sha256(
+        f"{stat.st_mtime_ns}|{stat.st_size}|{dpi}|{fmt}|{max_pixels}|{quality}".encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, path_key, version_key)
+
+
+def _read_cache_manifest(entry_dir):
+    """The manifest of a complete cache entry, or None if there is none."""
+    try:
+        with open(os.path.join(entry_dir, "manifest.json"), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_cached_pages(entry_dir):
+    """Yield the encoded page images of a complete cache entry, or None if there is none."""
+    manifest = _read_cache_manifest(entry_dir)
+    if manifest is None:
+        return None
+
+    def pages():
+        for name in manifest["pages"]:
+            with open(os.path.join(entry_dir, name), "rb") as file:
+                yield file.read()
+
+    return pages()
+
+
+def _cached_version(entry_dir):
+    """The PDF mtime and size recorded in a cache entry's manifest, or None if it has none."""
+    manifest = _read_cache_manifest(entry_dir)
+    if manifest is None or "mtime_ns" not in manifest or "size" not in manifest:
+        return None
+    return {"mtime_ns": manifest["mtime_ns"], "size": manifest["size"]}
+
+
+def _encode_page(img, fmt, max_pixels=None, quality=DEFAULT_QUALITY):
+    """Downsize a page image to the pixel budget and encode it in the given format."""
+    image_format = IMAGE_FORMATS[fmt]
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        scale = (max_pixels / (width * height)) ** 0.5
+        img = img.resize((max(1, int(width * scale)), max(1, int(height * scale))))
+    if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        img.save(buffer, format=image_format)
+    else:
+        img.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _render_pdf_pages(pdf_path, dpi, fmt, max_pixels=None, quality=DEFAULT_QUALITY,
+                      chunk_pages=RENDER_CHUNK_PAGES, thread_count=RENDER_THREADS):
+    """
+    Render a PDF with Poppler in chunks of pages and yield the encoded page images.
+
+    Only one chunk of PIL images is alive at a time, and each chunk is rendered with
+    `thread_count` Poppler threads.
+    """
+    page_count = pdfinfo_from_path(pdf_path)["Pages"]
+    for _, data in _render_page_ranges(pdf_path, range(1, page_count + 1), dpi, fmt, max_pixels, quality,
+                                       chunk_pages, thread_count):
+        yield data
+
+
+def _render_page_ranges(pdf_path, page_numbers, dpi, fmt, max_pixels=None, quality=DEFAULT_QUALITY,
+                        chunk_pages=RENDER_CHUNK_PAGES, thread_count=RENDER_THREADS):
+    """
+    Render the given pages (in ascending order) and yield (page number, encoded image).
+
+    Consecutive pages are rendered together, at most `chunk_pages` per Poppler call.
+    """
+    chunks = []
+    for page_number in page_numbers:
+        if chunks and page_number == chunks[-1][1] + 1 and page_number - chunks[-1][0] < chunk_pages:
+            chunks[-1][1] = page_number
+        else:
+            chunks.append([page_number, page_number])
+
+    for first_page, last_page in chunks:
+        images = convert_from_path(
+            pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+            thread_count=min(thread_count, last_page - first_page + 1),
+        )
+        for page_number, img in enumerate(images, start=first_page):
+            yield page_number, _encode_page(img, fmt, max_pixels, quality)
+            img.close()
+        del images
+
+
+def _render_and_cache_pages(pdf_path, entry_dir, pages):
+    """
+    Write each rendered page into a temporary directory that is renamed into place
+    once every page is written, and yield the encoded pages as they are produced.
+    """
+    stat = os.stat(pdf_path)
+    version = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    names = []
+    try:
+        for page_number, data in enumerate(pages, start=1):
+            name = f"page_{page_number:04d}"
+            with open(os.path.join(tmp_dir, name), "wb") as file:
+                file.write(data)
+            names.append(name)
+            yield data
+
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as file:
+            json.dump({"pdf_path": os.path.abspath(pdf_path), "pages": names, **version}, file)
+        # Drop renders of older versions of this PDF (renders of this version at other
+        # settings are kept), then publish the new entry
+        parent_dir = os.path.dirname(entry_dir)
+        for sibling in os.listdir(parent_dir):
+            sibling_path = os.path.join(parent_dir, sibling)
+            if sibling_path != tmp_dir and not sibling.endswith(".tmp") \
+                    and _cached_version(sibling_path) != version:
+                shutil.rmtree(sibling_path, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def iter_pdf_page_images(pdf_path, dpi=DEFAULT_DPI, fmt="png", cache_dir=PAGE_CACHE_DIR,
+                         max_pixels=DEFAULT_MAX_PIXELS, quality=DEFAULT_QUALITY):
+    """
+    Yield the encoded page images of a PDF, served from the on-disk page cache when the
+    PDF (path, mtime and size) and rendering settings match a previous render.
+
+    Args:
+        pdf_path (str): PDF file path.
+        dpi (int): Rendering resolution.
+        fmt (str): Image format of the encoded pages ("png", "jpeg" or "webp").
+        cache_dir (str, optional): Cache directory; None disables the cache.
+        max_pixels (int, optional): Pixel budget per page; None keeps the rendered size.
+        quality (int): Encoder quality for JPEG and WebP.
+    """
+    pages = _render_pdf_pages(pdf_path, dpi, fmt, max_pixels, quality)
+    if cache_dir is None:
+        yield from pages
+        return
+
+    entry_dir = _page_cache_entry(pdf_path, dpi, fmt, cache_dir, max_pixels, quality)
+    cached = _read_cached_pages(entry_dir)
+    if cached is not None:
+        yield from cached
+        return
+
+    os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+    yield from _render_and_cache_pages(pdf_path, entry_dir, pages)
+
+
+def iter_pdf_selected_page_images(pdf_path, page_numbers, dpi=DEFAULT_DPI, fmt="png", cache_dir=PAGE_CACHE_DIR,
+                                  max_pixels=DEFAULT_MAX_PIXELS, quality=DEFAULT_QUALITY):
+    """
+    Yield (page number, encoded image) for some pages of a PDF, in page order.
+
+    The pages are read from a complete cached render of the PDF when there is one.
+    Otherwise only these pages are rendered, and nothing is written to the cache,
+    which holds whole documents.
+    """
+    page_numbers = sorted(set(page_numbers))
+    if cache_dir is not None:
+        entry_dir = _page_cache_entry(pdf_path, dpi, fmt, cache_dir, max_pixels, quality)
+        manifest = _read_cache_manifest(entry_dir)
+        if manifest is not None:
+            for page_number in page_numbers:
+                if 1 <= page_number <= len(manifest["pages"]):
+                    with open(os.path.join(entry_dir, manifest["pages"][page_number - 1]), "rb") as file:
+                        yield page_number, file.read()
+            return
+    yield from _render_page_ranges(pdf_path, page_numbers, dpi, fmt, max_pixels, quality)
+
+
+def _image_uri(data, fmt):
+    return f"data:{IMAGE_MIME_TYPES[IMAGE_FORMATS[fmt]]};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def iter_image_uris_from_pdfs(pdf_paths, dpi=DEFAULT_DPI, fmt="png", cache_dir=PAGE_CACHE_DIR,
+                              max_pixels=DEFAULT_MAX_PIXELS, quality=DEFAULT_QUALITY):
+    """
+    Yield image URIs for the pages of a list of PDFs, one page at a time.
 
-def generate_image_uris_from_pdfs(pdf_paths):
+    Args:
+        pdf_paths (list of str): List of PDF file paths.
+        dpi (int): Rendering resolution.
+        fmt (str): Image format of the pages ("png", "jpeg" or "webp").
+        cache_dir (str, optional): Page image cache directory; None disables the cache.
+        max_pixels (int, optional): Pixel budget per page; None keeps the rendered size.
+        quality (int): Encoder quality for JPEG and WebP.
+
+    Yields:
+        str: Image URI in base64 format.
+    """
+    for pdf_path in pdf_paths:
+        try:
+            for data in iter_pdf_page_images(pdf_path, dpi=dpi, fmt=fmt, cache_dir=cache_dir,
+                                             max_pixels=max_pixels, quality=quality):
+                yield _image_uri(data, fmt)
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {e}")
+
+
+def generate_image_uris_from_pdfs(pdf_paths, **kwargs):
     """
     Convert a list of PDF paths into a list of image URIs.
 
     Args:
         pdf_paths (list of str): List of PDF file paths.
+        **kwargs: Rendering options passed to `iter_image_uris_from_pdfs`.
 
     Returns:
         list of str: List of image URIs in base64 format.
     """
-    def convert_doc_to_images(path):
-        return convert_from_path(path)
+    return list(iter_image_uris_from_pdfs(pdf_paths, **kwargs))
+
+
+def estimate_image_tokens(width, height):
+    """Estimate the prompt tokens of a high-detail image of the given pixel size."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _rendered_size(page_size, dpi, max_pixels):
+    """Pixel size a PDF page of the given size in points renders to at the DPI and pixel budget."""
+    width, height = page_size[0] * dpi / 72, page_size[1] * dpi / 72
+    if max_pixels and width * height > max_pixels:
+        scale = (max_pixels / (width * height)) ** 0.5
+        width, height = width * scale, height * scale
+    return max(1, int(width)), max(1, int(height))
+
+
+def _score_pages(page_counts, query_terms):
+    """Score each page (term counts) by the idf-weighted, log-damped frequency of the query terms it contains."""
+    terms = set(query_terms)
+    document_freq = Counter(term for counts in page_counts for term in terms if term in counts)
+    n_pages = len(page_counts)
+    return [
+        sum(
+            (1 + math.log(counts[term])) * math.log(1 + n_pages / document_freq[term])
+            for term in terms if term in counts
+        )
+        for counts in page_counts
+    ]
 
-    def get_img_uri(img):
-        png_buffer = io.BytesIO()
-        img.save(png_buffer, format="PNG")
-        png_buffer.seek(0)
-        base64_png = base64.b64encode(png_buffer.read()).decode('utf-8')
-        return f"data:image/png;base64,{base64_png}"
 
-    all_image_uris = []
-    for pdf_path in pdf_paths:
+def _read_policy_pages(pdf_path):
+    """Parse a PDF that is missing from the policy index; returns its pages and their term counts."""
+    pages, page_counts = [], []
+    try:
+        for page_number, page in enumerate(PdfReader(pdf_path).pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            except Exception:
+                text = ""
+            page_counts.append(Counter(tokenize(text)))
+            pages.append({"pdf_path": pdf_path, "page": page_number, "size": page_size(page)})
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+    return pages, page_counts
+
+
+def plan_policy_pages(pdf_paths, query_extraction, token_budget=IMAGE_TOKEN_BUDGET, dpi=DEFAULT_DPI,
+                      max_pixels=DEFAULT_MAX_PIXELS, index=None, top_k=None):
+    """
+    Choose which policy pages to attach to the document analysis prompt.
+
+    Pages are ranked by how well their text matches the query topics and RAG questions,
+    and taken in that order while their estimated image tokens fit the budget. Pages
+    without extractable text (e.g. scans) score zero and fill any remaining budget in
+    document order. With a `PolicyIndex` covering every PDF, pages are ranked by BM25
+    from the index and no PDF is opened. Otherwise only the PDFs the index does not
+    cover (or that changed since they were indexed) are parsed, and all pages are
+    scored together from their term counts.
+
+    Args:
+        pdf_paths (list of str): List of PDF file paths.
+        query_extraction (dict): Query extraction with 'topics' and 'rag_queries'.
+        token_budget (int): Maximum estimated image tokens for the selected pages.
+        dpi (int): Rendering resolution used for the size estimate.
+        max_pixels (int, optional): Pixel budget per page used for the size estimate.
+        index (PolicyIndex, optional): Page index of the policy corpus.
+        top_k (int, optional): Maximum number of pages to select.
+
+    Returns:
+        list of dict: One entry per page with 'pdf_path', 'page', 'score', 'tokens' and 'selected'.
+    """
+    query = " ".join(
+        list(query_extraction.get("topics", [])) + list(query_extraction.get("rag_queries", []))
+    )
+    covered = {pdf_path for pdf_path in pdf_paths if index is not None and index.covers(pdf_path)}
+    if covered and len(covered) == len(set(pdf_paths)):
+        index_scores = index.score(query)
+        pages, scores = [], []
+        for pdf_path in pdf_paths:
+            for page_number in index.pages_of(pdf_path):
+                page_id = index.page_id(pdf_path, page_number)
+                pages.append({"pdf_path": pdf_path, "page": page_number, "size": index.page_sizes[page_id]})
+                scores.append(float(index_scores[page_id]))
+    else:
+        pages, page_counts = [], []
+        for pdf_path in pdf_paths:
+            if pdf_path in covered:
+                for page_number, page in enumerate(index.indexed_pages(pdf_path), start=1):
+                    pages.append({"pdf_path": pdf_path, "page": page_number, "size": page["size"]})
+                    page_counts.append(page["terms"])
+            else:
+                pdf_pages, pdf_page_counts = _read_policy_pages(pdf_path)
+                pages += pdf_pages
+                page_counts += pdf_page_counts
+        scores = _score_pages(page_counts, tokenize(query))
+
+    used_tokens = 0
+    selected_count = 0
+    for position in sorted(range(len(pages)), key=lambda i: -scores[i]):
+        page = pages[position]
+        page["score"] = round(scores[position], 4)
+        page["tokens"] = estimate_image_tokens(*_rendered_size(page.pop("size"), dpi, max_pixels))
+        if top_k is not None and selected_count >= top_k:
+            page["selected"] = False
+            page["dropped_reason"] = "top_k"
+        elif used_tokens + page["tokens"] > token_budget:
+            page["selected"] = False
+            page["dropped_reason"] = "token_budget"
+        else:
+            page["selected"] = True
+            used_tokens += page["tokens"]
+            selected_count += 1
+    return pages
+
+
+def select_policy_page_images(data_obj, pdf_paths, token_budget=IMAGE_TOKEN_BUDGET,
+                              byte_budget=IMAGE_BYTE_BUDGET, index=None, top_k=None, **kwargs):
+    """
+    Render the policy pages chosen by `plan_policy_pages` and return their image URIs in
+    document order, keeping the total URI size within `byte_budget`. Only the selected
+    pages are rendered. The plan, including every dropped page, is recorded in
+    data_obj['policy_page_plan'].
+
+    Args:
+        data_obj (dict): Data object with 'query_extraction'; receives 'policy_page_plan'.
+        pdf_paths (list of str): List of PDF file paths.
+        token_budget (int): Maximum estimated image tokens.
+        byte_budget (int): Maximum total size of the image URIs in bytes.
+        index (PolicyIndex, optional): Page index used to rank the pages.
+        top_k (int, optional): Maximum number of pages to select.
+        **kwargs: Rendering options passed to `iter_pdf_selected_page_images`.
+
+    Returns:
+        list of str: Image URIs of the selected pages.
+    """
+    dpi = kwargs.setdefault("dpi", DEFAULT_DPI)
+    max_pixels = kwargs.setdefault("max_pixels", DEFAULT_MAX_PIXELS)
+    pages = plan_policy_pages(pdf_paths, data_obj["query_extraction"], token_budget, dpi, max_pixels,
+                              index=index, top_k=top_k)
+    wanted = {(page["pdf_path"], page["page"]): page for page in pages if page["selected"]}
+
+    image_uris = []
+    used_bytes = 0
+    fmt = kwargs.get("fmt", "png")
+    for pdf_path in dict.fromkeys(page["pdf_path"] for page in wanted.values()):
+        page_numbers = [page_number for path, page_number in wanted if path == pdf_path]
         try:
-            images = convert_doc_to_images(pdf_path)
-            all_image_uris.extend(get_img_uri(img) for img in images)
+            for page_number, data in iter_pdf_selected_page_images(pdf_path, page_numbers, **kwargs):
+                page = wanted[(pdf_path, page_number)]
+                image_uri = _image_uri(data, fmt)
+                if used_bytes + len(image_uri) > byte_budget:
+                    page["selected"] = False
+                    page["dropped_reason"] = "byte_budget"
+                    continue
+                used_bytes += len(image_uri)
+                image_uris.append(image_uri)
         except Exception as e:
             print(f"Error processing {pdf_path}: {e}")
 
-    return all_image_uris
+    dropped = [page for page in pages if not page["selected"]]
+    data_obj["policy_page_plan"] = {
+        "token_budget": token_budget,
+        "byte_budget": byte_budget,
+        "top_k": top_k,
+        "selected_pages": [
+            {"pdf_path": page["pdf_path"], "page": page["page"]} for page in pages if page["selected"]
+        ],
+        "image_tokens": sum(page["tokens"] for page in pages if page["selected"]),
+        "image_bytes": used_bytes,
+        "dropped_pages": dropped,
+    }
+    return image_uris
 
 
 def generate_query_prompt(query):
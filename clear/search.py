@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import argparse
-import re
+import asyncio
+import httpx
 import requests
 from rich import print
 from urllib.parse import urlparse, urlencode
@@ -8,6 +9,11 @@ from typing import List, Dict, Union
 from dataclasses import dataclass
 import json
 import config
+from clear.cleaners import clean_general, clean_wikipedia, simple_clean
+from clear.transport import async_transports, get_async_transport, get_transport
+from clear.http_cache import (
+    EXPIRED, FRESH, MISS, STALE, OfflineCacheMiss, get_response_cache, is_offline, normalise_query, normalise_url, set_offline,
+)
 
 # -------------------------------------------------------
 # BingSearch Class
@@ -38,7 +44,7 @@ class BingSearch:
         url = cls.BASE_PATH.format(urlencode(params))
         
         try:
-            rsp = requests.get(url, headers={'Ocp-Apim-Subscription-Key': cls.SECRET_KEY})
+            rsp = get_transport("bing").get(url, headers={'Ocp-Apim-Subscription-Key': cls.SECRET_KEY})
             rsp.raise_for_status()
         except requests.exceptions.RequestException as e:
             return False, f"HTTP request failed: {e}"
@@ -69,6 +75,13 @@ class SerperConfig:
     BASE_URL: str = "https://google.serper.dev/search"
     BATCH_LIMIT: int = 100
 
+def wikipedia_query(name: str, state: str, kind: str) -> str:
+    """Serper query used to find the Wikipedia page of an LGA (kind="lga") or a suburb (kind="suburb")."""
+    if kind == "lga":
+        return f"WIKIPEDIA local government of {name} {state} in Australia"
+    return f"WIKIPEDIA suburb of {name} {state} in Australia"
+
+
 class SerperSearch:
     def __init__(self, api_key: str = None):
         self.config = SerperConfig()
@@ -80,28 +93,100 @@ class SerperSearch:
             'Content-Type': 'application/json'
         }
     
-    def search(self, query: str, k:int=5) -> Dict:
-        """Single search query."""
-        payload = json.dumps({"q": query, "num": k, "gl": "au"})
+    def _post(self, payload) -> Union[Dict, List[Dict]]:
         try:
-            response = requests.post(self.config.BASE_URL, headers=self.headers, data=payload)
+            response = get_transport("serper").post(self.config.BASE_URL, headers=self.headers, data=json.dumps(payload))
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             raise Exception(f"API request failed: {str(e)}")
 
+    async def _apost(self, payload) -> Union[Dict, List[Dict]]:
+        try:
+            response = await get_async_transport("serper").post(
+                self.config.BASE_URL, headers=self.headers, content=json.dumps(payload)
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise Exception(f"API request failed: {str(e)}")
+
+    @staticmethod
+    def _cache_request(query: str, k: int) -> Dict:
+        return {"q": normalise_query(query), "num": k, "gl": "au"}
+
+    def search(self, query: str, k:int=5) -> Dict:
+        """Single search query, served from the response cache when possible."""
+        return get_response_cache().fetch(
+            "serper", self._cache_request(query, k), lambda: self._post({"q": query, "num": k, "gl": "au"})
+        )
+
+    async def asearch(self, query: str, k:int=5) -> Dict:
+        """Async version of `search`, sharing its response cache entries."""
+        payload = {"q": query, "num": k, "gl": "au"}
+        return await get_response_cache().afetch(
+            "serper", self._cache_request(query, k), lambda: self._apost(payload), lambda: self._post(payload)
+        )
+
+    def search_many(self, queries: List[str], k:int=5) -> List[Dict]:
+        """
+        Search any number of queries with as few requests as possible: duplicates are
+        sent once and the rest go out in search_batch calls of up to BATCH_LIMIT queries.
+        Results are returned in the order of `queries`.
+        """
+        unique_queries = list(dict.fromkeys(queries))
+        if len(unique_queries) == 1:
+            results = {unique_queries[0]: self.search(unique_queries[0], k=k)}
+        else:
+            results = {}
+            for start in range(0, len(unique_queries), self.config.BATCH_LIMIT):
+                chunk = unique_queries[start:start + self.config.BATCH_LIMIT]
+                results.update(zip(chunk, self.search_batch(chunk, k=k)))
+        return [results[q] for q in queries]
+
     def search_batch(self, queries: List[str], k:int=5) -> List[Dict]:
         """Batch search multiple queries."""
         if len(queries) > self.config.BATCH_LIMIT:
             raise ValueError(f"Batch size exceeds limit of {self.config.BATCH_LIMIT}")
         
-        payload = json.dumps([{"q": q, "num": k, "gl": "au"} for q in queries])
-        try:
-            response = requests.post(self.config.BASE_URL, headers=self.headers, data=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
+        # Only queries without a usable cached response go into the batch request
+        cache = get_response_cache()
+        cache_requests = [self._cache_request(q, k) for q in queries]
+        results = [None] * len(queries)
+        missing, stale, expired = [], [], {}
+        for i, cache_request in enumerate(cache_requests):
+            value, state = cache.lookup("serper", cache_request)
+            if state == FRESH or (state != MISS and is_offline()):
+                results[i] = value
+            elif state == STALE:
+                results[i] = value
+                stale.append(i)
+            else:
+                if state == EXPIRED:
+                    expired[i] = value
+                missing.append(i)
+
+        if missing:
+            if is_offline():
+                raise OfflineCacheMiss(f"Offline mode: no cached serper response for {queries[missing[0]]!r}")
+            try:
+                fetched = self._post([{"q": queries[i], "num": k, "gl": "au"} for i in missing])
+            except Exception:
+                # As in ResponseCache.fetch, expired entries are used when the request fails
+                if len(expired) < len(missing):
+                    raise
+                fetched = [None] * len(missing)
+            for i, value in zip(missing, fetched):
+                if value is None:
+                    results[i] = expired.get(i)
+                    continue
+                cache.store("serper", cache_requests[i], value)
+                results[i] = value
+        for i in stale:
+            cache.revalidate(
+                "serper", cache_requests[i], lambda q=queries[i]: self._post({"q": q, "num": k, "gl": "au"})
+            )
+        return results
 
 
 # -------------------------------------------------------
@@ -131,6 +216,70 @@ class FireScrape:
             format_type (str): The format of the response (default is 'markdown').
             scrape_type (str): One of ['simple','general','wiki'] controlling the cleanup style.
         """
+        # The raw scrape is cached, so every scrape_type is served from one entry
+        try:
+            data_got = get_response_cache().fetch(
+                "firecrawl", {"url": normalise_url(url), "format": format_type},
+                lambda: cls._scrape(url, format_type),
+            )
+        except OfflineCacheMiss as e:
+            print(e)
+            return ""
+        return cls._clean(data_got, scrape_type)
+
+    @classmethod
+    async def acrawl(cls, url: str, format_type: str = 'markdown', scrape_type: str = 'general') -> str:
+        """Async version of `crawl`, sharing its response cache entries."""
+        try:
+            data_got = await get_response_cache().afetch(
+                "firecrawl", {"url": normalise_url(url), "format": format_type},
+                lambda: cls._ascrape(url, format_type), lambda: cls._scrape(url, format_type),
+            )
+        except OfflineCacheMiss as e:
+            print(e)
+            return ""
+        return cls._clean(data_got, scrape_type)
+
+    @classmethod
+    def _clean(cls, data_got, scrape_type: str) -> str:
+        if data_got is None:
+            return ""
+        if scrape_type == "simple":
+            return FireScrape.simple_clean(data_got)
+        elif scrape_type == "general":
+            return FireScrape.clean_content_general(data_got)
+        elif scrape_type == "wiki":
+            return FireScrape.clean_content_wikipedia(data_got)
+        return ""
+
+    @classmethod
+    def _scrape(cls, url: str, format_type: str):
+        """Raw page content from the Firecrawl API, or None if the scrape failed."""
+        try:
+            response = get_transport("firecrawl").post(cls.API_URL, **cls._scrape_request(url, format_type))
+            jdata = response.json()
+            if jdata['success']:
+                return jdata['data'].get(format_type, "")
+            return None
+        except requests.RequestException as e:
+            print(f"Error making request to Firecrawl API: {e}")
+            return None
+
+    @classmethod
+    async def _ascrape(cls, url: str, format_type: str):
+        """Async version of `_scrape`."""
+        try:
+            response = await get_async_transport("firecrawl").post(cls.API_URL, **cls._scrape_request(url, format_type))
+            jdata = response.json()
+            if jdata['success']:
+                return jdata['data'].get(format_type, "")
+            return None
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error making request to Firecrawl API: {e}")
+            return None
+
+    @classmethod
+    def _scrape_request(cls, url: str, format_type: str) -> Dict:
         payload = {
             "url": url,
             "formats": [format_type],
@@ -142,73 +291,53 @@ class FireScrape:
             "Authorization": f"Bearer {cls.API_KEY}",
             "Content-Type": "application/json"
         }
-        try:
-            response = requests.post(cls.API_URL, headers=headers, json=payload)
-            jdata = response.json()
-            if jdata['success']:
-                data_got = jdata['data'].get(format_type, "")
-                if scrape_type == "simple":
-                    return FireScrape.simple_clean(data_got)
-                elif scrape_type == "general":
-                    return FireScrape.clean_content_general(data_got)
-                elif scrape_type == "wiki":
-                    return FireScrape.clean_content_wikipedia(data_got)
-            return ""
-        except requests.RequestException as e:
-            print(f"Error making request to Firecrawl API: {e}")
-            return ""
+        return {"headers": headers, "json": payload}
             
     @classmethod
     def simple_clean(cls, content: str) -> str:
-        # Remove Markdown-style image links
-        content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
-        # Remove lines starting with "More information on..."
-        content = re.sub(r'^More information on.*$', '', content, flags=re.MULTILINE)
-        # Replace multiple consecutive newlines with a single newline
-        content = re.sub(r'\n{3,}', '\n', content)
-        return content
+        """Removes image links, "More information on..." lines and blank lines."""
+        return simple_clean(content)
     
     @classmethod
     def clean_content_general(cls, content: str) -> str:
         """Cleans general webpage content."""
-        # Remove markdown image links
-        content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
-        # (Optional) remove more patterns if needed
-        # e.g., content = re.sub(r'\[(.*?)\]\(.*?\)', r'\1', content)
-        # Reduce multiple newlines
-        content = re.sub(r'\n{3,}', '\n', content)
-        return content.strip()
+        return clean_general(content)
 
     @classmethod
     def clean_content_wikipedia(cls, content: str) -> str:
-        """Cleans Wikipedia content."""
-        # Pass 1: remove markdown image links
-        content = re.sub(r'!\[(.*?)\]\(.*?\)', r'\1', content)
-        # Pass 2: remove standard markdown links, references, etc.
-        content = re.sub(r'\[(.*?)\]\(.*?\)|\[(.*?)\]', lambda m: (m.group(1) or m.group(2)), content)
-        
-        removal_patterns = [
-            r'\[\d+\]',                  # Reference brackets like [1], [2]
-            r'\s?\[edit\]\s?',
-            r'!\s*<br><br>',
-            r'\\?\[\d+\\?\]',
-            r'\\?\[edit(?:\"\))?\\?\s*\\?\]',
-            r'<br>',
-            r'\bhttps?://\S+\b',
-            r'\bwww\.\S+\b',
-            r'(?:\.jpg\)?)?'
-        ]
-        for pattern in removal_patterns:
-            content = re.sub(pattern, '', content)
-        content = re.sub(r'\n{2,}', '\n', content)
+        """Cleans Wikipedia content (links, references, [edit] markers, URLs; text before the references)."""
+        return clean_wikipedia(content)
+
+
+# -------------------------------------------------------
+# Concurrent search and scrape
+# -------------------------------------------------------
+async def scrape_pages(urls: List[str]) -> List[str]:
+    """Scrape the URLs concurrently, using the 'wiki' cleanup for Wikipedia pages and 'general' otherwise."""
+    return await asyncio.gather(*(
+        FireScrape.acrawl(url, scrape_type='wiki' if FireScrape.is_wikipedia_url(url) else 'general')
+        for url in urls
+    ))
+
+
+async def search_and_scrape(query: str, k: int = 5, searcher: SerperSearch = None) -> List[Dict]:
+    """
+    Serper top-k search, then scrape all k hits in parallel.
 
-        # (Optional) separate references
-        if "the free encyclopedia" in content:
-            content = content.split('the free encyclopedia', 1)[1].strip()
-        if 'References\n' in content:
-            content, references = map(str.strip, content.split('References\n', 1))
+    Returns the organic results, each with the cleaned page content under 'text'.
+    """
+    searcher = searcher or SerperSearch()
+    result = await searcher.asearch(query, k=k)
+    items = [dict(item) for item in result.get('organic', [])[:k]]
+    texts = await scrape_pages([item.get('link', '') for item in items])
+    for item, text in zip(items, texts):
+        item['text'] = text
+    return items
 
-        return content.strip()
+
+async def _run_closing_transports(coro):
+    async with async_transports():
+        return await coro
 
 
 # -------------------------------------------------------
@@ -221,26 +350,28 @@ def main():
     parser.add_argument("--query", type=str, default="Artificial Intelligence (AI) will replace 50% of all human jobs by 2030.",
                         help="Search query.")
     parser.add_argument("--top_k", type=int, default=3, 
-                        help="Number of search results to retrieve from Bing.")
+                        help="Number of search results to retrieve.")
+    parser.add_argument("--engine", type=str, default="bing", choices=["bing", "serper"],
+                        help="Search engine for the query.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve scrapes only from the response cache.")
     args = parser.parse_args()
+    if args.offline:
+        set_offline(True)
 
-    # Create a BingSearch instance
-    searcher = BingSearch()
-
-    # Perform search
-    search_result = searcher.search(args.query, k=args.top_k)
+    if args.engine == "serper":
+        search_result = asyncio.run(_run_closing_transports(search_and_scrape(args.query, k=args.top_k)))
+    else:
+        # Perform search, then scrape every hit concurrently
+        # (Wikipedia pages get the 'wiki' cleanup, the rest 'general')
+        search_result = BingSearch().search(args.query, k=args.top_k)
+        texts = asyncio.run(_run_closing_transports(
+            scrape_pages([item["page_url"] for item in search_result])
+        ))
+        for item, text in zip(search_result, texts):
+            item['text'] = text
 
-    # Process results
-    wiki_result = []
     for item in search_result:
-        url = item["page_url"]
-        # Decide how to scrape: if Wikipedia => 'wiki', else 'general'
-        if FireScrape.is_wikipedia_url(url):
-            item['text'] = FireScrape.crawl(url, scrape_type='wiki')
-            wiki_result.append(item)
-        else:
-            item['text'] = FireScrape.crawl(url, scrape_type='general')
-        
         print(item)  # Print the item dict, including 'text'
     
     print("[bold green]Done![/bold green]")
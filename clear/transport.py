@@ -0,0 +1,217 @@
+"""
+Shared HTTP transport for the search and scrape clients.
+
+Each provider gets one pooled `requests.Session`, connect/read timeouts, a token-bucket
+rate limiter and retries with jittered exponential backoff on connection errors,
+timeouts, 429 and 5xx responses (honouring Retry-After). `AsyncTransport` does the same
+on an `httpx.AsyncClient` per event loop, with at most `max_concurrency` requests in
+flight; it shares the provider's rate limiter with the synchronous transport.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_AFTER = 60.0
+
+
+@dataclass
+class ProviderSettings:
+    rate_per_second: float = 5.0
+    burst: int = 5
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 3
+    backoff_seconds: float = 0.5
+    pool_size: int = 16
+    max_concurrency: int = 8
+
+
+PROVIDER_SETTINGS: Dict[str, ProviderSettings] = {
+    "bing": ProviderSettings(rate_per_second=3.0, burst=3, read_timeout=15.0),
+    "serper": ProviderSettings(rate_per_second=5.0, burst=5, read_timeout=15.0),
+    # Firecrawl renders the page (waitFor) before answering, so allow a longer read
+    "firecrawl": ProviderSettings(rate_per_second=2.0, burst=4, read_timeout=90.0, max_concurrency=5),
+}
+
+_transports: Dict[str, "Transport"] = {}
+_transports_lock = threading.Lock()
+_rate_limiters: Dict[str, "RateLimiter"] = {}
+_rate_limiters_lock = threading.Lock()
+# httpx.AsyncClient and asyncio.Semaphore are bound to the loop they were created on
+_async_transports = weakref.WeakKeyDictionary()
+
+
+class RateLimiter:
+    """Token bucket: `rate_per_second` requests on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def get_rate_limiter(provider: str, settings: ProviderSettings = None) -> RateLimiter:
+    """Process-wide rate limiter for a provider, shared by its sync and async transports."""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            settings = settings or PROVIDER_SETTINGS.get(provider, ProviderSettings())
+            limiter = _rate_limiters[provider] = RateLimiter(settings.rate_per_second, settings.burst)
+        return limiter
+
+
+def backoff_delay(attempt: int, backoff_seconds: float, retry_after: str = None) -> float:
+    """Retry-After if the server sent a number of seconds, else full-jitter exponential backoff."""
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    return random.uniform(0, backoff_seconds * (2 ** attempt))
+
+
+class Transport:
+    def __init__(self, provider: str, settings: ProviderSettings = None):
+        self.provider = provider
+        self.settings = settings or PROVIDER_SETTINGS.get(provider, ProviderSettings())
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.settings.pool_size, pool_maxsize=self.settings.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.rate_limiter = get_rate_limiter(provider, self.settings)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection errors, timeouts, 429 and 5xx responses.
+
+        The last response is returned even if it is still a 429/5xx, so callers keep
+        their own raise_for_status handling. The last connection error is re-raised.
+        """
+        kwargs.setdefault("timeout", (self.settings.connect_timeout, self.settings.read_timeout))
+        for attempt in range(self.settings.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.settings.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt, self.settings.backoff_seconds))
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.settings.max_retries:
+                return response
+            delay = backoff_delay(attempt, self.settings.backoff_seconds, response.headers.get("Retry-After"))
+            response.close()
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+def get_transport(provider: str) -> Transport:
+    """Process-wide transport for a provider ("bing", "serper" or "firecrawl")."""
+    transport = _transports.get(provider)
+    if transport is None:
+        with _transports_lock:
+            transport = _transports.get(provider)
+            if transport is None:
+                transport = _transports[provider] = Transport(provider)
+    return transport
+
+
+class AsyncTransport:
+    def __init__(self, provider: str, settings: ProviderSettings = None):
+        self.provider = provider
+        self.settings = settings or PROVIDER_SETTINGS.get(provider, ProviderSettings())
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.settings.read_timeout, connect=self.settings.connect_timeout),
+            limits=httpx.Limits(max_connections=self.settings.pool_size,
+                                max_keepalive_connections=self.settings.pool_size),
+        )
+        self.semaphore = asyncio.Semaphore(self.settings.max_concurrency)
+        self.rate_limiter = get_rate_limiter(provider, self.settings)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Async counterpart of `Transport.request`; also bounds the requests in flight."""
+        for attempt in range(self.settings.max_retries + 1):
+            await self.rate_limiter.aacquire()
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.settings.max_retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, self.settings.backoff_seconds))
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.settings.max_retries:
+                return response
+            await asyncio.sleep(backoff_delay(attempt, self.settings.backoff_seconds, response.headers.get("Retry-After")))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def get_async_transport(provider: str) -> AsyncTransport:
+    """Async transport for a provider on the running event loop."""
+    loop = asyncio.get_running_loop()
+    transports = _async_transports.setdefault(loop, {})
+    transport = transports.get(provider)
+    if transport is None:
+        transport = transports[provider] = AsyncTransport(provider)
+    return transport
+
+
+@asynccontextmanager
+async def async_transports():
+    """
+    Close the async transports of the running event loop on exit.
+
+    Wrap the top-level coroutine given to `asyncio.run` in this, so each run closes
+    its connection pools instead of leaving them open when the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        yield
+    finally:
+        transports = _async_transports.pop(loop, {})
+        for transport in transports.values():
+            await transport.aclose()
@@ -1,25 +1,62 @@
 #!/usr/bin/env python3
+import asyncio
 import os
 import time
 import json
 import pandas as pd
 import argparse
-from openai import OpenAI
-
-from utilize import extract_json_response, get_token_count, save_json
-from clear.search import SerperSearch, FireScrape
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+import httpx
+from PyPDF2 import PdfReader
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from utilize import count_tokens_batch, extract_json_response, save_json
+from clear.search import SerperSearch, FireScrape, wikipedia_query
+from clear.transport import async_transports
 from clear.prompt import (
     generate_query_prompt,
     section_community_analysis_prompt,
     section_topic_question_prompt,
-    generate_image_uris_from_pdfs,
+    select_policy_page_images,
     email_report_prompt,
 )
-from clear.db import PolicyMatcher
+from clear.db import get_policy_matcher
+from clear.extraction_cache import ExtractionCache
+from clear.http_cache import set_offline
+from clear.policy_index import get_policy_index
+from clear.policy_store import PolicyTextStore
 import config
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# OpenAI 客户端设置：连接池、超时和并发上限
+OPENAI_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+OPENAI_MAX_CONNECTIONS = 20
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 10
+OPENAI_MAX_CONCURRENCY = 8
+
+# 本地查询抽取模型及其生成参数；模型名和版本也是抽取缓存键的一部分
+EXTRACTION_MODEL_NAME = "oscarwu/Llama-3.2-3B-CLEAR"
+EXTRACTION_MODEL_REVISION = "main"
+EXTRACTION_MAX_INPUT_TOKENS = 1250
+EXTRACTION_MAX_NEW_TOKENS = 220
+EXTRACTION_BATCH_SIZE = 8
+# 约束解码：只允许生成符合抽取结构的 token（训练时的 Python repr 形式或 JSON），并在右大括号后立即结束。
+# 在用真实模型对 io_dataset_instruct.json 评估（python -m clear.json_decoding --evaluate）之前默认关闭
+EXTRACTION_CONSTRAINED_DECODING = False
+
+# 文档分析最多附带的政策页数（按 BM25 相关度从 data/pdf_lga 的页面索引中选取）
+POLICY_TOP_K = 20
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+_gpt_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+# 每个事件循环一个 (AsyncOpenAI, asyncio.Semaphore)，异步客户端不能跨事件循环复用
+_async_openai_clients = weakref.WeakKeyDictionary()
+
 
 def create_output_folder(base_path="output"):
     timestamp = time.strftime("%Y%m%d_%H%M%S")
@@ -42,56 +79,193 @@ def save_generation_results(output_folder, data_obj, text_obj, gen_results):
     print(f"Results saved to {output_folder}")
 
 
-def call_gpt(prompt_messages, model="gpt-4o", temperature=0.2, top_p=0.1):
-    client = OpenAI(api_key=config.OPENAI_API_KEY)
+def _openai_limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, whose connection pool is reused across calls."""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=config.OPENAI_API_KEY,
+                    timeout=OPENAI_TIMEOUT,
+                    http_client=DefaultHttpxClient(limits=_openai_limits(), timeout=OPENAI_TIMEOUT),
+                )
+    return _openai_client
+
+
+def get_async_openai_client():
+    """
+    Return the AsyncOpenAI client and concurrency semaphore for the running event loop.
+
+    Returns:
+        tuple: (AsyncOpenAI, asyncio.Semaphore)
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_openai_clients.get(loop)
+    if entry is None:
+        client = AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY,
+            timeout=OPENAI_TIMEOUT,
+            http_client=DefaultAsyncHttpxClient(limits=_openai_limits(), timeout=OPENAI_TIMEOUT),
+        )
+        entry = _async_openai_clients[loop] = (client, asyncio.Semaphore(OPENAI_MAX_CONCURRENCY))
+    return entry
+
+
+@asynccontextmanager
+async def async_openai_clients():
+    """
+    Close the AsyncOpenAI client of the running event loop on exit.
+
+    Wrap the coroutine given to asyncio.run that calls acall_gpt in this.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        yield
+    finally:
+        # 事件循环结束前关闭其连接池
+        entry = _async_openai_clients.pop(loop, None)
+        if entry is not None:
+            await entry[0].close()
+
+
+def _gpt_payload(prompt_messages, model, temperature, top_p, timeout):
     response_payload = {
         "model": model,
         "messages": prompt_messages,
         "temperature": temperature,
         "top_p": top_p,
     }
+    if timeout is not None:
+        response_payload["timeout"] = timeout
+    return response_payload
+
+
+def call_gpt(prompt_messages, model="gpt-4o", temperature=0.2, top_p=0.1, timeout=None):
+    client = get_openai_client()
+    response_payload = _gpt_payload(prompt_messages, model, temperature, top_p, timeout)
     try:
-        response = client.chat.completions.create(**response_payload)
+        with _gpt_semaphore:
+            response = client.chat.completions.create(**response_payload)
         return response
     except Exception as e:
         print(f"Error occurred: {e}")
         return None
 
 
-def generate_extraction(user_query, model, tokenizer, device, max_retries=2):
-    prompt = generate_query_prompt(user_query)
+async def acall_gpt(prompt_messages, model="gpt-4o", temperature=0.2, top_p=0.1, timeout=None):
+    """Async counterpart of call_gpt sharing one pooled client per event loop."""
+    client, semaphore = get_async_openai_client()
+    response_payload = _gpt_payload(prompt_messages, model, temperature, top_p, timeout)
+    try:
+        async with semaphore:
+            response = await client.chat.completions.create(**response_payload)
+        return response
+    except Exception as e:
+        print(f"Error occurred: {e}")
+        return None
 
-    for attempt in range(max_retries + 1):
-        print(f"[yellow]Attempt {attempt + 1} to process the user query...[/yellow]")
+
+def _generate_raw_outputs(prompts, model, tokenizer, device, constrained=False):
+    """
+    Generate for a batch of prompts in one call and decode each full sequence. With
+    `constrained`, output is restricted to the query extraction JSON schema.
+    """
+    # decoder-only 模型批量生成时必须左填充，否则新 token 会接在 padding 后面
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    try:
         input_tokens = tokenizer(
-            prompt,
+            prompts,
             padding=True,
             truncation=True,
-            max_length=1250,
+            max_length=EXTRACTION_MAX_INPUT_TOKENS,
             return_tensors="pt",
         ).to(device)
+    finally:
+        tokenizer.padding_side = padding_side
+
+    generate_kwargs = {}
+    if constrained:
+        from transformers import LogitsProcessorList
+        from clear.json_decoding import QueryExtractionLogitsProcessor
+
+        generate_kwargs["logits_processor"] = LogitsProcessorList([QueryExtractionLogitsProcessor(tokenizer)])
+
+    output_tokens = model.generate(
+        **input_tokens,
+        max_new_tokens=EXTRACTION_MAX_NEW_TOKENS,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+        **generate_kwargs,
+    )
+    return tokenizer.batch_decode(output_tokens, skip_special_tokens=True)
 
-        output_tokens = model.generate(
-            **input_tokens,
-            max_new_tokens=220,
-            eos_token_id=tokenizer.eos_token_id,
-        )
 
-        raw_output = tokenizer.decode(output_tokens[0], skip_special_tokens=True)
-        extracted_response = extract_json_response(raw_output)
+def generate_extraction_batch(queries, model, tokenizer, device, batch_size=EXTRACTION_BATCH_SIZE, max_retries=2,
+                              constrained=EXTRACTION_CONSTRAINED_DECODING):
+    """
+    Extract location, topics and RAG queries for many user queries.
 
-        if extracted_response:
-            print("[green]Successfully extracted the JSON response.[/green]")
-            return extracted_response
-        else:
-            print(f"[red]Extraction failed on attempt {attempt + 1}. Retrying...[/red]\n{raw_output}")
+    Prompts are generated `batch_size` at a time with left padding, grouped by length to
+    keep padding small. Only the items whose JSON failed to parse are retried; with
+    `constrained` decoding that only happens if an item runs out of new tokens.
+
+    Returns:
+        list: Extraction dicts in the order of `queries`; None for items that still
+        failed after `max_retries` retries.
+    """
+    prompts = [generate_query_prompt(query) for query in queries]
+    results = [None] * len(queries)
+    pending = sorted(range(len(queries)), key=lambda i: len(prompts[i]))
+
+    for attempt in range(max_retries + 1):
+        print(f"[yellow]Attempt {attempt + 1} to process {len(pending)} user queries...[/yellow]")
+        failed = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            raw_outputs = _generate_raw_outputs(
+                [prompts[i] for i in batch], model, tokenizer, device, constrained=constrained
+            )
+            for i, raw_output in zip(batch, raw_outputs):
+                extracted_response = extract_json_response(raw_output)
+                if extracted_response:
+                    results[i] = extracted_response
+                else:
+                    print(f"[red]Extraction failed for query {i} on attempt {attempt + 1}.[/red]\n{raw_output}")
+                    failed.append(i)
+        pending = failed
+        if not pending:
+            break
+
+    if pending:
+        print(f"[bold red]{len(pending)} of {len(queries)} extractions failed after all attempts.[/bold red]")
+    return results
+
+
+def generate_extraction(user_query, model, tokenizer, device, max_retries=2, constrained=EXTRACTION_CONSTRAINED_DECODING):
+    extracted_response = generate_extraction_batch(
+        [user_query], model, tokenizer, device, batch_size=1, max_retries=max_retries, constrained=constrained
+    )[0]
+    if extracted_response:
+        print("[green]Successfully extracted the JSON response.[/green]")
+        return extracted_response
 
     print("[bold red]All extraction attempts failed. Please check the model or input query.[/bold red]")
     raise RuntimeError("Failed to extract JSON response after maximum retries.")
 
 
 def fetch_policy_data(query_extraction, data_object):
-    db_matcher = PolicyMatcher()
+    db_matcher = get_policy_matcher()
     location_details = query_extraction.get('location', {})
 
     print("[blue]Searching the database for matching location...[/blue]")
@@ -119,18 +293,35 @@ def fetch_policy_data(query_extraction, data_object):
     return data_object
 
 
-def validate_and_scrape(search_result, name, result_type):
+def validate_wiki_result(search_result, name, result_type):
+    """Link of the top Wikipedia result if it mentions `name`, else None."""
     if (
         name in search_result['organic'][0].get('snippet', '') or
         name in search_result['organic'][0].get('title', '')
     ):
         print(f"{result_type.capitalize()} {name} found in Wikipedia result.")
-        return FireScrape.crawl(search_result['organic'][0].get('link', ''), scrape_type="wiki")
+        return search_result['organic'][0].get('link', '')
     else:
         print(f"{result_type.capitalize()} {name} not found in Wikipedia result.")
         return None
 
 
+async def scrape_variable_pages(lga_wiki_url, suburb_wiki_url, census_url):
+    """Scrape the LGA and suburb Wikipedia pages and the census page concurrently."""
+    async def crawl(url, scrape_type):
+        if url is None:
+            return None
+        return await FireScrape.acrawl(url, scrape_type=scrape_type)
+
+    # 每次 asyncio.run 结束时关闭该事件循环的连接池
+    async with async_transports():
+        return await asyncio.gather(
+            crawl(lga_wiki_url, "wiki"),
+            crawl(suburb_wiki_url, "wiki"),
+            crawl(census_url, "general"),
+        )
+
+
 def fetch_additional_variables(data_object):
     searcher = SerperSearch()
 
@@ -138,9 +329,14 @@ def fetch_additional_variables(data_object):
     state_name = data_object['suburb_info']['state']
     suburb_name = data_object['suburb_info']['suburb']
 
-    lga_query = f"WIKIPEDIA local government of {lga_name} {state_name} in Australia"
-    lga_result = searcher.search(lga_query, k=1)
-    lga_wiki_var = validate_and_scrape(lga_result, lga_name, "lga")
+    # LGA 和 suburb 的 Wikipedia 查询合并为一次批量请求
+    queries = [wikipedia_query(lga_name, state_name, "lga")]
+    if data_object['has_suburb_in_db']:
+        queries.append(wikipedia_query(suburb_name, state_name, "suburb"))
+    search_results = searcher.search_many(queries, k=1)
+
+    lga_result = search_results[0]
+    lga_wiki_url = validate_wiki_result(lga_result, lga_name, "lga")
 
     if 'organic' in lga_result:
         lga_wiki_var_reference = lga_result['organic'][0]
@@ -148,18 +344,20 @@ def fetch_additional_variables(data_object):
         lga_wiki_var_reference = None
 
     if data_object['has_suburb_in_db']:
-        sub_query = f"WIKIPEDIA suburb of {suburb_name} {state_name} in Australia"
-        sub_result = searcher.search(sub_query, k=1)
+        sub_result = search_results[1]
         if 'organic' in sub_result:
             suburb_wiki_var_reference = sub_result['organic'][0]
         else:
             suburb_wiki_var_reference = None
-        suburb_wiki_var = validate_and_scrape(sub_result, suburb_name, "suburb")
+        suburb_wiki_url = validate_wiki_result(sub_result, suburb_name, "suburb")
     else:
-        suburb_wiki_var = None
+        suburb_wiki_url = None
         suburb_wiki_var_reference = None
 
-    lga_census_var = FireScrape.crawl(data_object['lga_info']['censusURL_2021'], scrape_type='general')
+    # 三个页面并发抓取，耗时取决于最慢的一个页面
+    lga_wiki_var, suburb_wiki_var, lga_census_var = asyncio.run(scrape_variable_pages(
+        lga_wiki_url, suburb_wiki_url, data_object['lga_info']['censusURL_2021']
+    ))
 
     text_var = {}
     text_var['page_var'] = {
@@ -176,15 +374,129 @@ def display_table(df: pd.DataFrame) -> str:
     return f"###Table in json format: {df.to_json()}"
 
 
-def extract_policy_texts(policy_paths, layout):
-    policy_texts = {}
-    policy_name_list = []
+def select_policy_pages(data_object, lga_policy_path):
+    """Render the policy pages most relevant to the extracted topics and RAG queries."""
+    return select_policy_page_images(
+        data_object, lga_policy_path, index=get_policy_index(), top_k=POLICY_TOP_K
+    )
+
+
+def timed_stage(stage_name, func, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        print(f"[cyan]Stage '{stage_name}' finished in {time.perf_counter() - start:.2f}s[/cyan]")
+
+
+def generate_reports(data_object, lga_policy_path, gpt_model):
+    """
+    Run the report generation stages concurrently.
+
+    Wikipedia/census scraping and PDF rasterisation start together. The community
+    analysis waits only for the scraping, while the document analysis waits only for
+    the page images and is followed by the email report. As soon as any stage fails,
+    stages that have not started yet are skipped so no further GPT calls are made for
+    a report that will be discarded, and the first error is raised.
+
+    Returns:
+        tuple: (text_var, gen_results)
+    """
+    policy_text_var = {"lga_policy_path": lga_policy_path}
+    failed = threading.Event()
+
+    def run_stage(stage_name, func, *args, **kwargs):
+        if failed.is_set():
+            raise RuntimeError(f"Stage '{stage_name}' skipped because another stage failed.")
+        try:
+            return timed_stage(stage_name, func, *args, **kwargs)
+        except BaseException:
+            failed.set()
+            raise
+
+    def community_analysis(scrape_future):
+        text_var = {**scrape_future.result(), **policy_text_var}
+        commu_prompt = section_community_analysis_prompt(data_object, text_var)
+        commu_gen = run_stage("community_analysis", call_gpt, commu_prompt, model=gpt_model)
+        return text_var, commu_gen.choices[0].message.content
+
+    def document_and_email_analysis(images_future):
+        image_uris = images_future.result()
+        document_analysis_prompt = section_topic_question_prompt(data_object, policy_text_var, image_uris)
+        document_analysis_gen = run_stage(
+            "document_analysis", call_gpt, document_analysis_prompt, model=gpt_model
+        )
+        document_analysis_text = document_analysis_gen.choices[0].message.content
+
+        email_prompt = email_report_prompt(data_object, policy_text_var, document_analysis_text)
+        email_gen = run_stage("email_report", call_gpt, email_prompt, model=gpt_model)
+        return document_analysis_text, email_gen.choices[0].message.content
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=4)
+    try:
+        scrape_future = executor.submit(run_stage, "scrape_variables", fetch_additional_variables, data_object)
+        images_future = executor.submit(
+            run_stage, "pdf_to_images", select_policy_pages, data_object, lga_policy_path
+        )
+        community_future = executor.submit(community_analysis, scrape_future)
+        document_future = executor.submit(document_and_email_analysis, images_future)
+
+        futures = [scrape_future, images_future, community_future, document_future]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            if future in done and future.exception() is not None:
+                failed.set()
+                raise future.exception()
+
+        text_var, commu_gen_text = community_future.result()
+        document_analysis_text, email_text = document_future.result()
+    finally:
+        # 失败时不等待仍在进行的阶段，未开始的阶段直接取消
+        executor.shutdown(wait=not failed.is_set(), cancel_futures=True)
+    print(f"[cyan]Report generation finished in {time.perf_counter() - start:.2f}s[/cyan]")
+
+    gen_results = {
+        "community_analysis_text": commu_gen_text,
+        "document_analysis_text": document_analysis_text,
+        "email_report_text": email_text,
+    }
+    return text_var, gen_results
+
+
+def extract_policy_texts(policy_paths, layout=None, store=None):
+    """
+    Collect the text of each policy PDF, keyed by "policy_<n>_token_<count>".
+
+    Text comes from the policy text store when the PDF is stored and unchanged. Other PDFs
+    are parsed with `layout` (a callable returning an object with `.text`), or from
+    their pages if no layout is given.
+    """
+    store = store or PolicyTextStore()
+    texts = [None] * len(policy_paths)
+    token_counts = [None] * len(policy_paths)
     for i, pdf_path in enumerate(policy_paths):
+        document = store.get_document(pdf_path)
+        if document is not None:
+            texts[i], token_counts[i] = document["text"], document["token_count"]
+            continue
         print(f"[blue]Processing PDF: {pdf_path}[/blue]")
-        doc = layout(pdf_path)
-        policy_name = f"policy_{i+1}_token_{get_token_count(doc.text)}"
+        if layout is not None:
+            texts[i] = layout(pdf_path).text
+        else:
+            texts[i] = "\n".join(page.extract_text() or "" for page in PdfReader(pdf_path).pages)
+
+    # 只为未命中存储的 PDF 计算 token 数
+    missing = [i for i, count in enumerate(token_counts) if count is None]
+    for i, count in zip(missing, count_tokens_batch([texts[i] for i in missing], stream=True)):
+        token_counts[i] = count
+
+    policy_texts = {}
+    policy_name_list = []
+    for i, (text, token_count) in enumerate(zip(texts, token_counts)):
+        policy_name = f"policy_{i+1}_token_{token_count}"
         policy_name_list.append(policy_name)
-        policy_texts[policy_name] = doc.text
+        policy_texts[policy_name] = text
     return policy_texts, policy_name_list
 
 
@@ -210,18 +522,67 @@ def main():
         default="gpt-4o",
         help="GPT model to use for API calls (default: gpt-4o)."
     )
+    parser.add_argument(
+        "--cpu_dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "bfloat16", "int8"],
+        help="Model dtype on CPU: float32, bfloat16 or dynamic int8 quantisation (default: float32)."
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=None,
+        help="Number of CPU threads for model inference (default: torch default)."
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve Serper searches and Firecrawl scrapes only from the response cache."
+    )
+    parser.add_argument(
+        "--no_extraction_cache",
+        action="store_true",
+        help="Always run the extraction model instead of reusing cached extractions."
+    )
+    parser.add_argument(
+        "--constrained_decoding",
+        action="store_true",
+        default=EXTRACTION_CONSTRAINED_DECODING,
+        help="Restrict query extraction output to the extraction schema."
+    )
     args = parser.parse_args()
-
-    # 加载模型和分词器，传入设备参数（若 args.device 为 None 则自动检测）
-    from clear.load_model import load_model_and_tokenizer
-
-    model, tokenizer, device = load_model_and_tokenizer(device=args.device)
+    if args.offline:
+        set_offline(True)
 
     # 使用用户查询
     user_query = args.query
 
-    # 生成提取内容
-    query_extraction = generate_extraction(user_query, model, tokenizer, device)
+    # 先查抽取缓存，命中时无需加载模型
+    extraction_cache = ExtractionCache()
+    query_extraction = None
+    if not args.no_extraction_cache:
+        query_extraction = extraction_cache.get(user_query, EXTRACTION_MODEL_NAME, EXTRACTION_MODEL_REVISION)
+        if query_extraction is not None:
+            print("[green]Using cached query extraction.[/green]")
+
+    if query_extraction is None:
+        # 加载模型和分词器，传入设备参数（若 args.device 为 None 则自动检测）
+        from clear.load_model import load_model_and_tokenizer
+
+        model, tokenizer, device = load_model_and_tokenizer(
+            model_name=EXTRACTION_MODEL_NAME,
+            device=args.device,
+            revision=EXTRACTION_MODEL_REVISION,
+            cpu_dtype=args.cpu_dtype,
+            num_threads=args.num_threads,
+        )
+
+        # 生成提取内容
+        query_extraction = generate_extraction(
+            user_query, model, tokenizer, device, constrained=args.constrained_decoding
+        )
+        extraction_cache.put(user_query, EXTRACTION_MODEL_NAME, EXTRACTION_MODEL_REVISION, query_extraction)
 
     data_object = {
         "user_query": user_query,
@@ -235,39 +596,18 @@ def main():
             f"[red]No matching records found in the database![/red]\n{data_object.get('log_info', 'No log info available')}"
         )
 
-    # 使用爬虫抓取额外变量信息
-    text_var = fetch_additional_variables(data_object)
     lga_policy_path = [
         os.path.join(ROOT_DIR, "data", "pdf_lga", policy["pdf_path"])
         for policy in data_object.get("policies", [])
     ]
-    text_var["lga_policy_path"] = lga_policy_path
-
-    # 使用 GPT API 生成社区分析报告
-    commu_prompt = section_community_analysis_prompt(data_object, text_var)
-    commu_gen = call_gpt(commu_prompt, model=args.gpt_model)
-    commu_gen_text = commu_gen.choices[0].message.content
-
-    # 使用 GPT API 生成文档分析报告
-    image_uris = generate_image_uris_from_pdfs(lga_policy_path)
-    document_analysis_prompt = section_topic_question_prompt(data_object, text_var, image_uris)
-    document_analysis_gen = call_gpt(document_analysis_prompt, model=args.gpt_model)
-    document_analysis_text = document_analysis_gen.choices[0].message.content
 
-    # 使用 GPT API 生成电子邮件报告
-    email_prompt = email_report_prompt(data_object, text_var, document_analysis_text)
-    email_gen = call_gpt(email_prompt, model=args.gpt_model)
-    email_text = email_gen.choices[0].message.content
+    # 并发抓取额外变量信息、转换政策 PDF，并使用 GPT API 生成社区分析、文档分析和电子邮件报告
+    text_var, gen_results = generate_reports(data_object, lga_policy_path, args.gpt_model)
 
     # 创建输出文件夹
     output_folder = create_output_folder()
 
     # 保存生成结果
-    gen_results = {
-        "community_analysis_text": commu_gen_text,
-        "document_analysis_text": document_analysis_text,
-        "email_report_text": email_text,
-    }
     save_generation_results(output_folder, data_object, text_var, gen_results)
 
 
@@ -1,77 +1,274 @@
 import pandas as pd
 import requests
 import os
+import argparse
+import json
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 from pathlib import Path
 
-def download_pdf(url, base_path, pdf_path):
+MAX_WORKERS = 16
+# Councils host their own PDFs, so keep the load on any one server small
+PER_HOST_LIMIT = 4
+REQUEST_TIMEOUT = (10, 60)  # (connect, read) seconds
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 1.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Retries wait while holding the per-host slot, so never honour a longer Retry-After
+MAX_RETRY_AFTER = 60
+CHUNK_SIZE = 64 * 1024
+MANIFEST_NAME = "download_manifest.json"
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """Session with a connection pool large enough for every download worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "CLEAR-policy-downloader/1.0"})
+    return session
+
+
+def _host_limit(url):
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_limits[host]
+
+
+def _backoff(attempt, retry_after=None):
+    """Sleep before the next attempt: Retry-After if the server sent one, else jittered exponential backoff."""
+    if retry_after is not None and retry_after.isdigit():
+        time.sleep(min(int(retry_after), MAX_RETRY_AFTER))
+    else:
+        time.sleep(BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(base_path):
+    """Manifest of previous downloads: pdf_path -> {policyURL, etag, last_modified, size, sha256}."""
+    try:
+        with open(os.path.join(base_path, MANIFEST_NAME), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(base_path, manifest):
+    path = os.path.join(base_path, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _is_unchanged(full_save_path, record, url):
+    """Whether the file on disk is the one recorded for this URL in the manifest."""
+    if not record or record.get("policyURL") != url or not os.path.exists(full_save_path):
+        return False
+    if os.path.getsize(full_save_path) != record.get("size"):
+        return False
+    return file_sha256(full_save_path) == record.get("sha256")
+
+
+def _fetch(session, url, part_path, record, conditional=None):
+    """
+    Download url into part_path, resuming from an existing .part file with a Range
+    request. Returns the response headers and whether the transfer was resumed, or
+    None for the latter if the server answered a conditional request with 304.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = dict(conditional or {})
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # Only resume if the server still has the version the .part file came from
+        if record and record.get("part_etag"):
+            headers["If-Range"] = record["part_etag"]
+
+    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            # The .part file is already complete (or longer than the file): start over
+            os.remove(part_path)
+            return _fetch(session, url, part_path, record, conditional)
+        if response.status_code == 304:
+            return response.headers, None
+        response.raise_for_status()
+        mode = "ab" if offset and response.status_code == 206 else "wb"
+        if record is not None:
+            record["part_etag"] = response.headers.get("ETag")
+        with open(part_path, mode) as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    file.write(chunk)
+        return response.headers, mode == "ab"
+
+
+def download_pdf(url, base_path, pdf_path, session=None, record=None, refresh=True):
     """
     url: PDF download URL
     base_path: Base directory (./data/pdf_lga/)
     pdf_path: Relative path/filename from the DataFrame
+    session: Shared requests session (a new one is made if not given)
+    record: Manifest entry of the previous download of this file, if any
+    refresh: Revalidate files that match the manifest with a conditional GET
+        (If-None-Match / If-Modified-Since); if False they are skipped without a request
+
+    Returns a dict with 'status' ("new", "changed", "unchanged" or "failed"), whether the
+    transfer was 'resumed', and the new manifest entry under 'record' (None on failure).
     """
+    full_save_path = os.path.join(base_path, pdf_path)
+    part_path = f"{full_save_path}.part"
+    record = dict(record or {})
     try:
-        # Construct full save path
-        full_save_path = os.path.join(base_path, pdf_path)
-        
-        # Create directory structure for the file
         os.makedirs(os.path.dirname(full_save_path), exist_ok=True)
-        
-        # Skip if file already exists
-        if os.path.exists(full_save_path):
-            print(f"File already exists: {pdf_path}")
-            return True
-        
-        # Download the file
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        # Save the file
-        with open(full_save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    file.write(chunk)
-        
-        print(f"Successfully downloaded: {pdf_path}")
-        return True
-    
+
+        if not record and os.path.exists(full_save_path):
+            # Downloaded before the manifest existed: adopt the file (it has no validators,
+            # so a refresh downloads it again and reports it unchanged if it is identical)
+            record = {
+                "policyURL": url,
+                "size": os.path.getsize(full_save_path),
+                "sha256": file_sha256(full_save_path),
+            }
+
+        # Only a file on disk that is the one recorded for this URL can be revalidated
+        conditional = {}
+        if _is_unchanged(full_save_path, record, url):
+            if not refresh:
+                return {"status": "unchanged", "resumed": False, "record": record}
+            if record.get("etag"):
+                conditional["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                conditional["If-Modified-Since"] = record["last_modified"]
+        previous_sha256 = record.get("sha256") if record.get("policyURL") == url else None
+
+        session = session or make_session(1)
+        with _host_limit(url):
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    headers, resumed = _fetch(session, url, part_path, record, conditional)
+                    break
+                except requests.exceptions.HTTPError as e:
+                    status_code = e.response.status_code if e.response is not None else None
+                    if status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                        raise
+                    _backoff(attempt, e.response.headers.get("Retry-After"))
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError):
+                    if attempt == MAX_RETRIES:
+                        raise
+                    _backoff(attempt)
+
+        record.pop("part_etag", None)
+        if resumed is None:
+            # 304 Not Modified: keep the file, pick up any refreshed validators
+            record["etag"] = headers.get("ETag", record.get("etag"))
+            record["last_modified"] = headers.get("Last-Modified", record.get("last_modified"))
+            return {"status": "unchanged", "resumed": False, "record": record}
+
+        record.update({
+            "policyURL": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": os.path.getsize(part_path),
+            "sha256": file_sha256(part_path),
+        })
+        os.replace(part_path, full_save_path)
+        if previous_sha256 is None:
+            status = "new"
+        else:
+            status = "unchanged" if record["sha256"] == previous_sha256 else "changed"
+        return {"status": status, "resumed": resumed, "record": record}
+
     except requests.exceptions.RequestException as e:
         print(f"Error downloading {pdf_path}: {str(e)}")
-        return False
     except Exception as e:
         print(f"Error saving {pdf_path}: {str(e)}")
-        return False
+    return {"status": "failed", "resumed": False, "record": None, "part_etag": record.get("part_etag")}
 
-def download_pdfs_from_df(df, base_path):
+
+def download_pdfs_from_df(df, base_path, max_workers=MAX_WORKERS, refresh=True):
     """
     df: DataFrame with 'policyURL' and 'pdf_path' columns
     base_path: Base directory for saving PDFs
+    max_workers: Number of concurrent downloads
+    refresh: Revalidate already downloaded files with conditional GETs
     """
+    manifest = load_manifest(base_path)
+    session = make_session(max_workers)
     results = []
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        try:
-            url = row['policyURL']
-            pdf_path = row['pdf_path']
-            success = download_pdf(url, base_path, pdf_path)
-            results.append({
-                'pdf_path': pdf_path,
-                'policyURL': url,
-                'success': success,
-                'full_path': os.path.join(base_path, pdf_path) if success else None
-            })
-        except Exception as e:
-            print(f"Error processing row: {e}")
-            results.append({
-                'pdf_path': pdf_path if 'pdf_path' in locals() else 'unknown',
-                'policyURL': url if 'url' in locals() else 'unknown',
-                'success': False,
-                'full_path': None
-            })
-    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    download_pdf, row.policyURL, base_path, row.pdf_path, session,
+                    manifest.get(row.pdf_path), refresh
+                ): (row.pdf_path, row.policyURL)
+                for row in df[['policyURL', 'pdf_path']].itertuples(index=False)
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                pdf_path, url = futures[future]
+                outcome = future.result()
+                if outcome["record"] is not None:
+                    manifest[pdf_path] = outcome["record"]
+                elif outcome.get("part_etag"):
+                    # Keep the ETag of a partial download so the next run can resume it
+                    manifest.setdefault(pdf_path, {})["part_etag"] = outcome["part_etag"]
+                success = outcome["status"] != "failed"
+                results.append({
+                    'pdf_path': pdf_path,
+                    'policyURL': url,
+                    'status': outcome["status"],
+                    'resumed': outcome["resumed"],
+                    'success': success,
+                    'full_path': os.path.join(base_path, pdf_path) if success else None
+                })
+    finally:
+        save_manifest(base_path, manifest)
+        session.close()
+
     return pd.DataFrame(results)
 
+def print_summary(results_df):
+    """Print how many files are new, changed, unchanged or failed, and list the changed and failed ones."""
+    counts = results_df['status'].value_counts()
+    print(f"\nDownload Summary:")
+    print(f"Total files: {len(results_df)}")
+    for status in ("new", "changed", "unchanged", "failed"):
+        print(f"{status.capitalize()}: {counts.get(status, 0)}")
+    for status in ("changed", "failed"):
+        paths = results_df.loc[results_df['status'] == status, 'pdf_path'].tolist()
+        if paths:
+            print(f"\n{status.capitalize()} files:")
+            for path in sorted(paths):
+                print(f"  {path}")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the policy PDFs listed in db_policies.xlsx.")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="Skip files that match the manifest instead of revalidating them.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Number of concurrent downloads.")
+    args = parser.parse_args()
+
     # Read Excel file
     data_path = "./data/db/db_policies.xlsx"
     base_save_dir = './data/pdf_lga'
@@ -89,19 +286,13 @@ if __name__ == "__main__":
         
         # Download PDFs
         print(f"Starting downloads for {len(df)} files...")
-        results_df = download_pdfs_from_df(df, base_save_dir)
-        
-        # Save results
-        results_path = os.path.join(base_save_dir, 'download_results.xlsx')
-        results_df.to_excel(results_path, index=False)
-        
-        # Print summary
-        success_count = results_df['success'].sum()
-        print(f"\nDownload Summary:")
-        print(f"Total files: {len(df)}")
-        print(f"Successfully downloaded: {success_count}")
-        print(f"Failed: {len(df) - success_count}")
-        print(f"Results saved to: {results_path}")
+        results_df = download_pdfs_from_df(
+            df, base_save_dir, max_workers=args.workers, refresh=not args.no_refresh
+        )
+
+        # Print summary; per-file state is kept in the download manifest
+        print_summary(results_df)
+        print(f"Manifest saved to: {os.path.join(base_save_dir, MANIFEST_NAME)}")
         
     except Exception as e:
-        print(f"Error: {str(e)}")
\ No newline at end of file
+        print(f"Error: {str(e)}")
@@ -5,6 +5,8 @@ import tiktoken
 import os
 import re
 import urllib.parse
+from functools import lru_cache
+from typing import List
 #from md2pdf.core import md2pdf
 
 
@@ -57,10 +59,76 @@ def save_json(data, file_path):
     except Exception as e:
         print(f"Error saving JSON file {file_path}: {e}")
 
-def get_token_count(text: str) -> int:
-    """Get number of tokens in text"""
-    encoder = tiktoken.get_encoding("cl100k_base") 
-    return len(encoder.encode(text))
+TOKEN_ENCODING = "cl100k_base"
+# Texts longer than this are counted chunk by chunk when stream=True
+TOKEN_STREAM_CHUNK_CHARS = 1 << 20
+
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name: str = TOKEN_ENCODING):
+    """Get the tiktoken encoder, loaded once per process"""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def _split_for_counting(text: str, chunk_chars: int = None) -> List[str]:
+    """
+    Split text into chunks of roughly chunk_chars, cutting only right after a newline
+    that is followed by a non-whitespace character. No cl100k token spans such a
+    position, so the chunk counts add up to the count of the whole text.
+    """
+    chunk_chars = chunk_chars or TOKEN_STREAM_CHUNK_CHARS
+    chunks = []
+    start = 0
+    while len(text) - start > chunk_chars:
+        cut = text.find("\n", start + chunk_chars)
+        while cut != -1 and cut + 1 < len(text) and text[cut + 1].isspace():
+            cut = text.find("\n", cut + 1)
+        if cut == -1 or cut + 1 >= len(text):
+            break
+        chunks.append(text[start:cut + 1])
+        start = cut + 1
+    chunks.append(text[start:])
+    return chunks
+
+
+def get_token_count(text: str, stream: bool = False) -> int:
+    """
+    Get number of tokens in text
+
+    Parameters:
+    text (str): Text to count; special tokens are counted as ordinary text.
+    stream (bool): Encode very long text in newline-aligned chunks so the full token
+        list is never held in memory.
+    """
+    encoder = get_encoder()
+    if stream and len(text) > TOKEN_STREAM_CHUNK_CHARS:
+        return sum(len(encoder.encode_ordinary(chunk)) for chunk in _split_for_counting(text))
+    return len(encoder.encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], num_threads: int = 8, stream: bool = False) -> List[int]:
+    """
+    Count tokens for many texts at once using tiktoken's threaded batch encoder.
+
+    Returns:
+    list of int: Token counts in the same order as texts.
+    """
+    encoder = get_encoder()
+    if not stream:
+        return [len(tokens) for tokens in encoder.encode_ordinary_batch(texts, num_threads=num_threads)]
+
+    # Encode the chunks of every text in one batch, then add them back up per text
+    owners, chunks = [], []
+    for index, text in enumerate(texts):
+        for chunk in _split_for_counting(text):
+            owners.append(index)
+            chunks.append(chunk)
+    counts = [0] * len(texts)
+    for start in range(0, len(chunks), num_threads):
+        batch = chunks[start:start + num_threads]
+        for index, tokens in zip(owners[start:start + num_threads], encoder.encode_ordinary_batch(batch, num_threads=num_threads)):
+            counts[index] += len(tokens)
+    return counts
 
 
 